@@ -0,0 +1,91 @@
+"""
+Accuracy of adaptive ray fans versus uniform ones, on a config file.
+
+Every fan is judged against a dense uniform reference fan: the endpoint of each
+reference ray is interpolated linearly (in angle) from the two neighbouring rays
+of the judged fan, and counted as misinterpolated when it is further than the
+tolerance from the traced one, or when the neighbours bounce a different number
+of times than the reference ray.
+
+Run with `python -m benchmarks.adaptive [config] [x y] [reference rays]` from the
+repository root, e.g. `python -m benchmarks.adaptive examples/cfg2.pyop 0 0`.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from pyoptics.config import parse_cfg
+from pyoptics.optics2d import OpticSystem
+from pyoptics.optics2d.kernels import trace, unit_vectors
+from pyoptics.sampling import adaptive_fan
+
+
+STEPS = 20
+TOLERANCE = 0.05
+CHUNK = 50_000
+
+
+def shoot(geometry, location, angles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Endpoints and bounce counts of a uniform fan, traced in chunks"""
+    endpoints, bounces = [], []
+    for i in range(0, len(angles), CHUNK):
+        chunk = angles[i : i + CHUNK]
+        origins = np.broadcast_to(location, chunk.shape + (2,))
+        result = trace(geometry, origins, unit_vectors(chunk), STEPS)
+        endpoints.append(result.endpoints())
+        bounces.append(result.bounces)
+    return np.concatenate(endpoints), np.concatenate(bounces)
+
+
+def misinterpolated(angles, endpoints, bounces, reference) -> int:
+    """Reference rays whose endpoint is not reproduced by the fan's neighbouring rays"""
+    ref_angles, ref_endpoints, ref_bounces = reference
+    right = np.clip(np.searchsorted(angles, ref_angles), 1, len(angles) - 1)
+    left = right - 1
+    t = (ref_angles - angles[left]) / (angles[right] - angles[left])
+    guess = endpoints[left] + t[:, None] * (endpoints[right] - endpoints[left])
+
+    wrong = np.linalg.norm(guess - ref_endpoints, axis=-1) > TOLERANCE
+    wrong |= (bounces[left] != ref_bounces) | (bounces[right] != ref_bounces)
+    return int(wrong.sum())
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "examples/cfg2.pyop"
+    location = np.array(sys.argv[2:4] if len(sys.argv) > 3 else (0, 0), dtype=float)
+    count = int(sys.argv[4]) if len(sys.argv) > 4 else 2_000_000
+
+    optics, _ = parse_cfg(path)
+    system = OpticSystem(optics)
+    geometry = system.compile().geometry
+    start, stop = -np.pi, np.pi
+
+    ref_angles = np.linspace(start, stop, count)
+    reference = (ref_angles, *shoot(geometry, location, ref_angles))
+
+    began = time.perf_counter()
+    fan = adaptive_fan(
+        system, location, start, stop, STEPS, tolerance=TOLERANCE, max_rays=10_000
+    )
+    elapsed = time.perf_counter() - began
+    rays = len(fan.angles)
+    wrong = misinterpolated(fan.angles, fan.endpoints, fan.bounces, reference)
+    print(f"{'adaptive':>8}: {rays:9} rays, {wrong:9} misinterpolated, {elapsed:6.2f} s")
+
+    for factor in (1, 10, 100):
+        began = time.perf_counter()
+        angles = np.linspace(start, stop, factor * rays)
+        endpoints, bounces = shoot(geometry, location, angles)
+        elapsed = time.perf_counter() - began
+        wrong = misinterpolated(angles, endpoints, bounces, reference)
+        print(
+            f"{'uniform':>8}: {len(angles):9} rays, {wrong:9} misinterpolated,"
+            f" {elapsed:6.2f} s"
+        )
+    print(f"out of {count} reference rays of {path} from {tuple(location.tolist())}")
+
+
+if __name__ == "__main__":
+    main()
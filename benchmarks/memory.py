@@ -0,0 +1,53 @@
+"""
+Memory used by large scenes, regular objects versus `CompactOpticSystem`.
+
+Run with `python -m benchmarks.memory [count]` from the repository root.
+"""
+
+import sys
+import tracemalloc
+
+import numpy as np
+
+from pyoptics.optics2d import FlatMirror, OpticSystem, RayEmitter, SphericalMirror
+from pyoptics.optics2d.compact import CompactOpticSystem
+
+
+def build(system_type, count: int):
+    rng = np.random.default_rng(0)
+    locations = rng.uniform(-100, 100, (count, 2))
+    rotations = rng.uniform(-np.pi, np.pi, count)
+
+    system = system_type()
+    for i in range(count):
+        match i % 3:
+            case 0:
+                system.add(FlatMirror(locations[i], rotations[i], 1))
+            case 1:
+                system.add(SphericalMirror(locations[i], rotations[i], 1, 1))
+            case _:
+                system.add(RayEmitter(locations[i], rotations[i]))
+    return system
+
+
+def measure(system_type, count: int) -> int:
+    tracemalloc.start()
+    system = build(system_type, count)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del system
+    return used
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for system_type in (OpticSystem, CompactOpticSystem):
+        used = measure(system_type, count)
+        print(
+            f"{system_type.__name__:>20}: {used / 2**20:8.1f} MiB"
+            f" ({used / count:6.1f} B per object, {count} objects)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,7 @@
 from .optics2d import *
-from .renderer import *
\ No newline at end of file
+
+try:
+    from .renderer import *
+except ModuleNotFoundError as e:  # pygame is only needed for rendering, not for tracing
+    if e.name != "pygame":
+        raise
@@ -1,14 +1,40 @@
 import argparse
+import asyncio
+from math import radians
+import os
 import sys
+import time
 import warnings
 
 from numpy import asarray
 import pygame
 
 import pyoptics
-from pyoptics.utils import scene_from_cfg
+from pyoptics.batch import find_configs, trace_configs, write_report
+from pyoptics.export import Sweep, render_frames
+from pyoptics.server import TraceServer
+from pyoptics.config import ConfigError
+from pyoptics.utils import scene_from_cfg, update_scene_from_cfg
 
 
+ZOOM_STEP = 1.1
+
+# buttons starting a drag or a pan, pygame 2 also reports the wheel as buttons 4 and 5
+DRAG_BUTTONS = (pygame.BUTTON_LEFT, pygame.BUTTON_MIDDLE, pygame.BUTTON_RIGHT)
+
+# seconds between checks of the config file in watch mode
+WATCH_INTERVAL = 0.25
+
+# while dragging or rotating, rays are traced with a fraction of the steps, and only
+# every n-th of them, n adapted so that a frame fits into the time budget (seconds)
+PREVIEW_STEPS = 0.25
+FRAME_BUDGET = 1 / 30
+# seconds without a wheel event after which a rotation is considered finished
+SETTLE_DELAY = 0.3
+
+# attributes `--sweep` can change, each a single number swept between START and STOP
+SWEEPABLE = ("rotation", "scale", "focal", "focal1", "focal2", "index", "thickness")
+
 class UIRunner:
     def __init__(self, cli_args):
 
@@ -18,6 +44,16 @@ class UIRunner:
         self.initial_moved_loc = asarray((0, 0))
         self.moved = None
         self.dragging = False
+        self.panning = False
+        # the button which started the current drag or pan
+        self.held_button = None
+
+        # reduced quality tracing while an object is being manipulated
+        self.previewing = False
+        self.preview_stride = 1
+        self.last_interaction = 0.0
+        # paths of the last full trace, shown for the rays a preview skips
+        self.full_paths = []
 
         pygame.init()
         self.screen = pygame.display.set_mode(tuple(cli_args.resolution))
@@ -25,6 +61,9 @@ class UIRunner:
         self.scene = self._build_scene()
         self.scene.run()
 
+        self.watched_mtime = self._config_mtime()
+        self.last_watch = time.monotonic()
+
         pygame.display.flip()
 
     def _build_scene(self):
@@ -43,6 +82,113 @@ class UIRunner:
                 scale=self.cli_args.scale,
             )
 
+    def preview(self, changed=None):
+        """
+        Quickly trace a subset of the rays with fewer steps, within `FRAME_BUDGET`.
+
+        The other rays keep their paths from the last full trace, `changed` (the
+        dragged or rotated object) is always traced if it is an emitter.
+        """
+        all_rays = list(self.scene.system.rays)
+        if not self.previewing:
+            self.full_paths = [
+                (list(r.bounce_locations), r.current_ray_location, r.last_bounce_direction)
+                for r in all_rays
+            ]
+
+        rays = []
+        for i, ray in enumerate(all_rays):
+            if i % self.preview_stride and i < len(self.full_paths) and ray != changed:
+                bounces, location, direction = self.full_paths[i]
+                ray.bounce_locations = list(bounces)
+                ray.current_ray_location = location
+                ray.last_bounce_direction = direction
+            else:
+                ray.reset()
+                rays.append(ray)
+        steps = max(1, int(self.cli_args.steps * PREVIEW_STEPS))
+
+        start = time.perf_counter()
+        for _ in range(steps):
+            if self.scene.system.step(rays):
+                break
+            if time.perf_counter() - start > FRAME_BUDGET:
+                break
+        elapsed = time.perf_counter() - start
+        self.scene.redraw()
+
+        # trace fewer rays if the frame took too long, more if there is time left
+        if elapsed > FRAME_BUDGET:
+            self.preview_stride = min(
+                2 * self.preview_stride, max(len(self.scene.system.rays), 1)
+            )
+        elif elapsed < FRAME_BUDGET / 4 and self.preview_stride > 1:
+            self.preview_stride //= 2
+
+        self.previewing = True
+        self.last_interaction = time.monotonic()
+
+    def settle(self) -> bool:
+        """Fully trace a wheel rotation once the wheel stops, return if it was traced"""
+        # the wheel's button events are ignored, so a rotation has no release to wait for
+        if (
+            self.previewing
+            and not self.dragging
+            and time.monotonic() - self.last_interaction > SETTLE_DELAY
+        ):
+            self.full_trace()
+            return True
+        return False
+
+    def full_trace(self):
+        """Trace every ray with the full number of steps"""
+        self.previewing = False
+        self.scene.reset()
+        self.scene.run()
+
+    def _config_mtime(self) -> float | None:
+        try:
+            return os.stat(self.cli_args.config).st_mtime
+        except (OSError, TypeError):
+            return None
+
+    def watch(self) -> bool:
+        """Reload the config file if it changed since the last check"""
+        now = time.monotonic()
+        if now - self.last_watch < WATCH_INTERVAL:
+            return False
+        self.last_watch = now
+
+        mtime = self._config_mtime()
+        if mtime is None or mtime == self.watched_mtime:
+            return False
+        self.watched_mtime = mtime
+
+        self.reload()
+        return True
+
+    def reload(self):
+        """Apply changes of the config file, re-tracing only the affected rays"""
+        try:
+            rays = update_scene_from_cfg(self.cli_args.config, self.scene)
+        except (ConfigError, ValueError, OSError) as e:
+            # the file may be saved half-written, keep the scene until it is fixed
+            print(f"Could not reload {self.cli_args.config}: {e}", file=sys.stderr)
+            return
+
+        # the dragged object may not exist anymore
+        self.moved = None
+        self.dragging = False
+
+        if self.previewing:
+            # the other rays are only partially traced as well
+            self.full_trace()
+            return
+
+        for ray in rays:
+            ray.reset()
+        self.scene.run(rays=rays)
+
     def process_event(self, event) -> bool:
         if event.type == pygame.QUIT:
             return False
@@ -52,15 +198,25 @@ class UIRunner:
 
         # manipulating the objects
         elif event.type == pygame.MOUSEBUTTONDOWN:
+            # wheel and side buttons, or a second button while one is held
+            if event.button not in DRAG_BUTTONS or self.held_button is not None:
+                return True
+
             mouse_pos = pygame.mouse.get_pos()
             for renderable in self.scene.object_renderers:
-                if renderable.check_mouse_hover(self.scene, mouse_pos):
+                if event.button == pygame.BUTTON_LEFT and renderable.check_mouse_hover(
+                    self.scene, mouse_pos
+                ):
                     self.initial_mouse_pos = mouse_pos
                     self.initial_moved_loc = renderable.obj.location
                     self.moved = renderable
                     self.dragging = True
                     break
-        # rotate      
+            else:
+                # pan the view by dragging the background or with the middle/right button
+                self.panning = True
+            self.held_button = event.button
+        # rotate, or zoom when not hovering over anything
         elif event.type == pygame.MOUSEWHEEL:
             obj = None
             mouse_pos = pygame.mouse.get_pos()
@@ -70,15 +226,27 @@ class UIRunner:
                     break
                 
             if obj is None:
+                self.scene.zoom(ZOOM_STEP**event.y, mouse_pos)
+                self.scene.redraw()
                 return True
             
             obj.rotation += event.y/100
+            self.preview(obj)
 
         elif event.type == pygame.MOUSEBUTTONUP:
+            if event.button != self.held_button:
+                return True
+            self.held_button = None
+            if self.panning:
+                self.panning = False
+                return True
             self.moved = None
             self.dragging = False
-            self.scene.reset()
-            self.scene.run()
+            self.full_trace()
+
+        elif event.type == pygame.MOUSEMOTION and self.panning:
+            self.scene.pan(event.rel)
+            self.scene.redraw()
 
         elif event.type == pygame.MOUSEMOTION and self.moved is not None and self.dragging:
             mouse_pos = pygame.mouse.get_pos()
@@ -90,8 +258,7 @@ class UIRunner:
             )
 
             self.moved.obj.location = self.initial_moved_loc + asarray((x, y))
-            self.scene.reset()
-            self.scene.run()
+            self.preview(self.moved.obj)
 
         return True
 
@@ -116,8 +283,8 @@ class UIRunner:
                 self.scene.add(pyoptics.SphericalMirror(loc, 0, 1))
 
             # add lens
-            # case pygame.K_l:
-            #     scene.add(pyoptics.Lens(loc, 0, 1, 1))
+            case pygame.K_l:
+                self.scene.add(pyoptics.Lens(loc, 0, 1))
 
             # add emitter
             case pygame.K_e:
@@ -144,6 +311,87 @@ class UIRunner:
                 running = self.process_event(event)
                 pygame.display.flip()
 
+            if self.cli_args.watch and self.watch():
+                pygame.display.flip()
+
+            if self.settle():
+                pygame.display.flip()
+
+
+def export(cli_args):
+    size = tuple(cli_args.resolution)
+    if cli_args.config:
+        system = scene_from_cfg(cli_args.config, pygame.Surface(size)).system
+    else:
+        system = pyoptics.OpticSystem()
+
+    if cli_args.sweep:
+        index, attribute, start, stop = cli_args.sweep
+        start, stop = float(start), float(stop)
+        if attribute == "rotation":
+            start, stop = radians(start), radians(stop)
+        update = Sweep(int(index), attribute, start, stop, cli_args.frames)
+    else:
+        update = _keep_still
+
+    render_frames(
+        system,
+        update,
+        cli_args.frames,
+        cli_args.export,
+        size=size,
+        steps=cli_args.steps,
+        scale=cli_args.scale,
+        workers=cli_args.workers,
+    )
+
+
+def _keep_still(system, frame):
+    pass
+
+
+def batch(cli_args) -> int:
+    paths = find_configs(cli_args.batch)
+    if not paths:
+        print(f"No configuration files found for {cli_args.batch}", file=sys.stderr)
+        return 1
+
+    results = trace_configs(
+        paths, cli_args.steps, workers=cli_args.workers, timeout=cli_args.timeout
+    )
+    write_report(results, cli_args.output)
+
+    failed = [result for result in results if not result.ok]
+    for result in failed:
+        print(f"{result.path}: {result.error}", file=sys.stderr)
+    print(
+        f"Traced {len(results) - len(failed)} of {len(results)} scenes, "
+        f"results written to {cli_args.output}"
+    )
+    return 1 if failed else 0
+
+
+def serve(cli_args):
+    address = cli_args.serve
+    server = TraceServer(workers=cli_args.workers)
+
+    async def run():
+        if ":" in address:
+            host, port = address.rsplit(":", 1)
+            listener = await server.serve_tcp(host, int(port))
+        else:
+            listener = await server.serve_unix(address)
+        print(f"Serving on {address}")
+        async with listener:
+            await listener.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
 
 def main():
     # command line parsing
@@ -165,9 +413,88 @@ def main():
     parser.add_argument(
         "-S", "--steps", help="Number of steps to run", type=int, default=20
     )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        help="Reload the configuration file whenever it changes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-e",
+        "--export",
+        help="Render PNG frames into this directory instead of opening a window",
+        default=None,
+    )
+    parser.add_argument(
+        "--frames", help="Number of frames to export", type=int, default=1
+    )
+    parser.add_argument(
+        "--sweep",
+        help="Sweep an attribute of the object at INDEX (optics first, then emitters) "
+        "from START to STOP over the exported frames. Only single number attributes "
+        "(rotation, scale, focal lengths, index, thickness) can be swept. Rotations "
+        "are given in degrees",
+        nargs=4,
+        metavar=("INDEX", "ATTRIBUTE", "START", "STOP"),
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        help="Number of worker processes used for exporting, batch tracing and "
+        "serving (all cores by default)",
+        type=int,
+        default=None,
+    )
+
+    parser.add_argument(
+        "-b",
+        "--batch",
+        help="Trace every configuration file in this directory (or matching this glob) "
+        "without opening a window",
+        default=None,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="File the batch results are written into",
+        default="batch_results.json",
+    )
+    parser.add_argument(
+        "--timeout",
+        help="Time limit for tracing a single scene in batch mode, in seconds",
+        type=float,
+        default=60,
+    )
+
+    parser.add_argument(
+        "--serve",
+        help="Run a trace server on a Unix socket at this path, or on HOST:PORT",
+        metavar="ADDRESS",
+        default=None,
+    )
 
     args = parser.parse_args()
 
+    if args.watch and not args.config:
+        parser.error("--watch requires a configuration file")
+
+    if args.sweep and args.sweep[1] not in SWEEPABLE:
+        parser.error(
+            f"--sweep cannot change {args.sweep[1]!r}, only one of {', '.join(SWEEPABLE)}"
+        )
+
+    if args.serve:
+        serve(args)
+        return
+
+    if args.batch:
+        return batch(args)
+
+    if args.export:
+        export(args)
+        return
+
     # main loop
 
     runner = UIRunner(args)
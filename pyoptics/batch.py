@@ -0,0 +1,160 @@
+"""Headless tracing of many config files, spread over worker processes"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import glob
+import json
+import os
+import signal
+import threading
+import time
+from typing import Iterator, NamedTuple
+
+import numpy as np
+
+from .optics2d import OpticSystem
+from .config import parse_cfg
+
+
+__all__ = [
+    "SceneResult",
+    "find_configs",
+    "trace_configs",
+    "write_report",
+]
+
+
+CONFIG_PATTERN = "*.pyop"
+
+
+class SceneResult(NamedTuple):
+    """Outcome of tracing a single config file"""
+
+    path: str
+    endpoints: np.ndarray | None  # (R, 2) location of the last bounce of every ray
+    bounces: np.ndarray | None  # (R,)
+    parse_time: float  # seconds
+    trace_time: float  # seconds
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool: # pylint: disable=C0116
+        return self.error is None
+
+
+def find_configs(pattern: str) -> list[str]:
+    """Config files in a directory, or matching a glob pattern, sorted by path"""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, CONFIG_PATTERN)
+    return sorted(glob.glob(pattern, recursive=True))
+
+
+@contextmanager
+def _time_limit(seconds: float | None) -> Iterator[None]:
+    """
+    Raise `TimeoutError` in the block after `seconds`, where the platform allows it.
+
+    Signal handlers can only be set in the main thread, elsewhere there is no limit.
+    """
+    if (
+        not seconds
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TimeoutError(f"took longer than {seconds} s")
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _trace_config(path: str, steps: int, timeout: float | None) -> SceneResult:
+    parse_time = trace_time = 0.0
+    start = time.perf_counter()
+    try:
+        with _time_limit(timeout):
+            optics, rays = parse_cfg(path)
+            parse_time = time.perf_counter() - start
+
+            result = OpticSystem(optics, rays).trace(steps)
+            trace_time = time.perf_counter() - start - parse_time
+    except Exception as e:  # reported, the batch goes on
+        if not parse_time:
+            parse_time = time.perf_counter() - start
+        else:
+            trace_time = time.perf_counter() - start - parse_time
+        return SceneResult(
+            path, None, None, parse_time, trace_time, f"{type(e).__name__}: {e}"
+        )
+
+    return SceneResult(
+        path, result.endpoints(), result.bounces, parse_time, trace_time
+    )
+
+
+def trace_configs(
+    paths: list[str],
+    steps: int = 20,
+    workers: int | None = None,
+    timeout: float | None = 60,
+) -> list[SceneResult]:
+    """
+    Parse and trace every config file with the vectorized kernels, without opening a window.
+
+    A scene which fails to load, fails to trace or takes longer than `timeout`
+    seconds is reported in its result instead of stopping the batch.
+
+    Returns
+    -------
+    list[SceneResult]
+        Results in the order of `paths`.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return [_trace_config(path, steps, timeout) for path in paths]
+
+    results = []
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(_trace_config, path, steps, timeout) for path in paths
+        ]
+        for path, future in zip(paths, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:  # e.g. a crashed worker
+                results.append(
+                    SceneResult(path, None, None, 0.0, 0.0, f"{type(e).__name__}: {e}")
+                )
+    return results
+
+
+def write_report(results: list[SceneResult], path: str) -> None:
+    """Write all results into a single JSON file"""
+    report = {
+        "scenes": len(results),
+        "failed": sum(not result.ok for result in results),
+        "results": [
+            {
+                "path": result.path,
+                "ok": result.ok,
+                "error": result.error,
+                "parse_time": result.parse_time,
+                "trace_time": result.trace_time,
+                "endpoints": None
+                if result.endpoints is None
+                else result.endpoints.tolist(),
+                "bounces": None if result.bounces is None else result.bounces.tolist(),
+            }
+            for result in results
+        ],
+    }
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1)
@@ -0,0 +1,147 @@
+"""Reading config files, without depending on the renderer"""
+
+from math import radians
+from typing import Iterable
+
+from .optics2d import (
+    FlatMirror,
+    Lens,
+    OpticSystem,
+    PolylineMirror,
+    RayEmitter,
+    SphericalMirror,
+)
+from .sampling import adaptive_fan
+
+
+__all__ = [
+    "ConfigError",
+    "parse_cfg",
+    "parse_cfg_lines",
+]
+
+
+# default limit of rays of an adaptive fan (`A`) in a config file
+FAN_RAYS = 200
+
+
+class ConfigError(Exception):
+    """Raised by the PyOptics library when a error occurs during the processing of a config file"""
+
+
+def parse_cfg(
+    path: str,
+) -> tuple[list[FlatMirror | SphericalMirror | PolylineMirror | Lens], list[RayEmitter]]:
+    """Read the optics and light emitters described by a config file"""
+    with open(path, "r") as f:
+        return parse_cfg_lines(f.readlines())
+
+
+def parse_cfg_lines(
+    lines: Iterable[str],
+) -> tuple[list[FlatMirror | SphericalMirror | PolylineMirror | Lens], list[RayEmitter]]:
+    """Same as `parse_cfg`, for the lines of a config file"""
+    optics: list[FlatMirror | SphericalMirror | PolylineMirror | Lens] = []
+    rays: list[RayEmitter] = []
+    fans: list[tuple[float, ...]] = []
+    for line in lines:
+        line = line.strip()
+
+        # remove comments
+        if "#" in line:
+            line = line[: line.index("#")]
+
+        if line.isspace():
+            continue
+
+        elems = line.split(",")
+        obj_type = elems[0].strip()
+        obj_args = tuple(map(lambda x: float(x.strip()), elems[1:]))
+        l = len(obj_args)
+        match obj_type:
+            case "F":
+                if l != 4:
+                    raise ConfigError(
+                        f"A FlatMirror instance needs 4 arguments, not {l}"
+                    )
+                optics.append(
+                    FlatMirror(
+                        (obj_args[0], obj_args[1]),
+                        radians(obj_args[2]),
+                        obj_args[3],
+                    )
+                )
+
+            case "S":
+                if l != 4 and l != 5:
+                    raise ConfigError(
+                        f"A SphericalMirror instance needs 4 or 5 arguments, not {l}"
+                    )
+                optics.append(
+                    SphericalMirror(
+                        (obj_args[0], obj_args[1]),
+                        radians(obj_args[2]),
+                        *obj_args[3:],
+                    )
+                )
+
+            case "L":
+                if l < 4 or l > 8:
+                    raise ConfigError(
+                        f"A Lens instance needs 4 to 8 arguments, not {l}"
+                    )
+                optics.append(
+                    Lens(
+                        (obj_args[0], obj_args[1]),
+                        radians(obj_args[2]),
+                        *obj_args[3:],
+                    )
+                )
+
+            case "P":
+                if l < 8 or l % 2:
+                    raise ConfigError(
+                        "A PolylineMirror instance needs 4 arguments followed by "
+                        f"at least 2 vertex coordinate pairs, not {l} arguments"
+                    )
+                optics.append(
+                    PolylineMirror(
+                        (obj_args[0], obj_args[1]),
+                        radians(obj_args[2]),
+                        obj_args[4:],
+                        obj_args[3],
+                    )
+                )
+
+            case "R" | "E":
+                if l != 3:
+                    raise ConfigError(
+                        f"A RayEmitter instance needs 3 arguments, not {l}"
+                    )
+                rays.append(
+                    RayEmitter((obj_args[0], obj_args[1]), radians(obj_args[2]))
+                )
+
+            case "A":
+                if l != 4 and l != 5:
+                    raise ConfigError(
+                        f"An adaptive fan needs 4 or 5 arguments, not {l}"
+                    )
+                fans.append(obj_args)
+
+    # fans are sampled only once all the optics they depend on are known, and only
+    # here: moving the optics in the editor does not resample them, a reload does
+    system = OpticSystem(optics)
+    for fan in fans:
+        rotation, half = radians(fan[2]), radians(fan[3]) / 2
+        rays.extend(
+            adaptive_fan(
+                system,
+                (fan[0], fan[1]),
+                rotation - half,
+                rotation + half,
+                max_rays=int(fan[4]) if len(fan) == 5 else FAN_RAYS,
+            ).emitters()
+        )
+
+    return optics, rays
@@ -0,0 +1,123 @@
+"""Offscreen rendering of frame sequences, spread over worker processes"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+import numpy as np
+import pygame
+
+from .optics2d import PI_HALF, FlatMirror, OpticSystem
+from .renderer import RenderScene
+
+
+__all__ = [
+    "Sweep",
+    "render_frames",
+]
+
+
+FRAME_PATTERN = "frame_{:05d}.png"
+
+Update = Callable[[OpticSystem, int], None]
+
+
+class Sweep:
+    """
+    Frame update linearly changing one attribute of one object between two values.
+
+    The first frame gets `start`, the last one `stop`. `index` points into
+    `system.optics + system.rays`, so that the sweep can be sent to worker processes
+    together with a copy of the system. Rotations (in radians) are given like to the
+    constructors and in config files, also for flat mirrors.
+    """
+
+    def __init__(self, index: int, attribute: str, start, stop, count: int) -> None:
+        self.index = index
+        self.attribute = attribute
+        self.start = np.asarray(start, dtype=float)
+        self.stop = np.asarray(stop, dtype=float)
+        self.count = count
+
+    def __call__(self, system: OpticSystem, frame: int) -> None:
+        obj = (system.optics + system.rays)[self.index]  # type: ignore
+        value = self.start + (self.stop - self.start) * frame / max(self.count - 1, 1)
+        if self.attribute == "rotation" and isinstance(obj, FlatMirror):
+            # the constructor stores the rotation of a flat mirror turned by 90 degrees
+            value = value - PI_HALF
+        setattr(obj, self.attribute, value if value.ndim else float(value))
+
+
+# state of a worker process, set up once by `_init_worker`
+_worker: dict[str, Any] = {}
+
+
+def _init_worker(system: OpticSystem, update: Update, options: dict[str, Any]) -> None:
+    # no window is ever opened, but make sure SDL never tries to
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    _worker.update(system=system, update=update, options=options)
+
+
+def _render_frame(frame: int) -> str:
+    system: OpticSystem = _worker["system"]
+    options = _worker["options"]
+
+    _worker["update"](system, frame)
+
+    surface = pygame.Surface(options["size"])
+    scene = RenderScene(
+        system, surface, options["steps"], options["scale"], options["middle"]
+    )
+    scene.reset()
+    scene.run()
+
+    path = os.path.join(options["directory"], options["pattern"].format(frame))
+    pygame.image.save(surface, path)
+    return path
+
+
+def render_frames(
+    system: OpticSystem,
+    update: Update,
+    count: int,
+    directory: str,
+    size: tuple[int, int] = (600, 600),
+    steps: int = 20,
+    scale: float = 40,
+    middle: tuple[int, int] | None = None,
+    workers: int | None = None,
+    pattern: str = FRAME_PATTERN,
+) -> list[str]:
+    """
+    Render `count` frames into PNG files without opening a window.
+
+    Before frame `i` is rendered, `update(system, i)` is called. Frames are rendered
+    out of order by separate processes, each holding its own copy of the system, so
+    `update` has to set the state for frame `i` from scratch and must be picklable
+    (a module level function or an object like `Sweep`).
+
+    Returns
+    -------
+    list[str]
+        Paths of the written files, in frame order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    options = {
+        "size": tuple(size),
+        "steps": steps,
+        "scale": scale,
+        "middle": middle if middle is not None else (size[0] // 2, size[1] // 2),
+        "directory": directory,
+        "pattern": pattern,
+    }
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(system, update, options)
+        return [_render_frame(frame) for frame in range(count)]
+
+    with ProcessPoolExecutor(
+        workers, initializer=_init_worker, initargs=(system, update, options)
+    ) as executor:
+        chunksize = max(1, count // (4 * workers))
+        return list(executor.map(_render_frame, range(count), chunksize=chunksize))
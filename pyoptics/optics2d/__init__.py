@@ -1,10 +1,27 @@
 from abc import ABC, abstractmethod
-from math import atan, copysign, cos, isclose, pi, sin, sqrt, tan
-from typing import Iterable, TypeAlias, Any
+from math import asin, atan, copysign, cos, isclose, pi, sin, sqrt
+from typing import Iterable, NamedTuple, Sequence, TypeAlias, Any
 
 import numpy as np
 from numpy import asarray
 
+from .kernels import (
+    BIG_NUMBER,
+    Geometry,
+    TraceResult,
+    flat_endpoints,
+    intersect_segments,
+    intersect_spheres,
+    ray_box_overlap,
+    reflect,
+    refract,
+    segment_blocks,
+    spherical_geometry,
+    thin_lens,
+    trace as _trace,
+    unit_vectors,
+)
+
 
 __all__ = [
     "RayEmitter",
@@ -12,7 +29,14 @@ __all__ = [
     "Lens",
     "FlatMirror",
     "SphericalMirror",
+    "PolylineMirror",
     "OpticSystem",
+    "CompiledScene",
+    "FlatGeometry",
+    "SphericalGeometry",
+    "PolylineGeometry",
+    "ThinLensGeometry",
+    "ThickLensGeometry",
     "VecArg",
     "Angle",
 ]
@@ -26,12 +50,18 @@ DirectionVec: TypeAlias = np.ndarray[np.floating, Any]
 PI = pi
 PI_HALF = PI / 2
 
-BIG_NUMBER = 1000
-
 
 class RayEmitter:
     """An emitter of laser light"""
 
+    __slots__ = (
+        "location",
+        "rotation",
+        "current_ray_location",
+        "last_bounce_direction",
+        "bounce_locations",
+    )
+
     def __init__(self, location, rotation) -> None:
         self.location: VecArg = asarray(location)
         self.rotation = rotation
@@ -49,15 +79,77 @@ class RayEmitter:
         self.bounce_locations = []
 
 
+class FlatGeometry(NamedTuple):
+    """Precomputed geometry of a `FlatMirror`"""
+
+    start: VecArg
+    end: VecArg
+    direction: DirectionVec
+    normal: DirectionVec
+    bounds: VecArg  # min x, min y, max x, max y
+
+
+class SphericalGeometry(NamedTuple):
+    """Precomputed geometry of a `SphericalMirror`"""
+
+    center: VecArg
+    radius: float
+    radius_sq: float
+    vertex: VecArg
+    reach: float  # max distance between the vertex and any point of the mirror
+    arc: tuple[Angle, Angle]  # angles of both edges, as seen from the center
+    bounds: VecArg  # min x, min y, max x, max y
+
+
+class PolylineGeometry(NamedTuple):
+    """Precomputed geometry of a `PolylineMirror`"""
+
+    vertices: np.ndarray  # (M, 2)
+    start: np.ndarray  # (M - 1, 2)
+    end: np.ndarray  # (M - 1, 2)
+    normals: np.ndarray  # (M - 1, 2)
+    vertex_normals: np.ndarray  # (M - 1, 2, 2) normals at both ends of every segment
+    blocks: np.ndarray  # (K, 4) bounds of every run of `PolylineMirror.BLOCK_SIZE` segments
+    bounds: VecArg  # min x, min y, max x, max y
+
+
+class ThinLensGeometry(NamedTuple):
+    """Precomputed geometry of a `Lens` without thickness"""
+
+    start: VecArg
+    end: VecArg
+    axis: DirectionVec  # optical axis
+    power: float  # 1 / focal length
+    bounds: VecArg  # min x, min y, max x, max y
+
+
+class ThickLensGeometry(NamedTuple):
+    """Precomputed geometry of both surfaces of a `Lens`, front surface first"""
+
+    center: np.ndarray  # (2, 2)
+    radius: np.ndarray  # (2,) positive for surfaces bulging out of the glass
+    vertex: np.ndarray  # (2, 2)
+    reach: np.ndarray  # (2,)
+    arc: np.ndarray  # (2, 2) angles of the edges of both surfaces, as seen from their centers
+    index: float  # refractive index of the glass
+    bounds: VecArg  # min x, min y, max x, max y
+
+
 class Optic(ABC):
     """Abstract Base Class for Optics"""
 
+    __slots__ = ("version", "_compiled", "_compiled_version")
+
     @abstractmethod
     def __init__(self) -> None:
         self.location: VecArg
         self.scale: float
         self.rotation: Angle
 
+        self.version = 0
+        self._compiled: Any = None
+        self._compiled_version = -1
+
     @abstractmethod
     def get_bounce(self, ray: RayEmitter) -> tuple[VecArg, Angle] | None:
         """
@@ -75,55 +167,276 @@ class Optic(ABC):
         """
         raise NotImplementedError
 
+    @property
+    def compiled(self) -> Any:
+        """Precomputed geometry of this optic, recomputed only after one of its properties changed"""
+        if self._compiled_version != self.version:
+            self._compiled = self._compile()
+            self._compiled_version = self.version
+        return self._compiled
+
+    def _compile(self) -> Any:
+        raise NotImplementedError
+
+    def _touch(self) -> None:
+        """Mark the precomputed geometry as outdated"""
+        self.version += 1
+
 
-# TODO
 class Lens(Optic):
+    """
+    A spherical lens.
+
+    Both surfaces are described like a `SphericalMirror`: their radii of curvature are
+    `2 * focal1` (front surface, facing `rotation`) and `2 * focal2` (back surface),
+    positive for convex surfaces. A lens with no thickness is an ideal thin lens with
+    the focal length given by the lensmaker's equation, a thick lens refracts rays at
+    both of its surfaces. The rim of a thick lens is not simulated.
+    """
+
+    __slots__ = (
+        "__location",
+        "__rotation",
+        "__scale",
+        "__focal1",
+        "__focal2",
+        "__index",
+        "__thickness",
+    )
+
     def __init__(
-        self, location, rotation: Angle, scale: float, focal1=1.0, focal2=1.0
+        self,
+        location,
+        rotation: Angle,
+        scale: float,
+        focal1=1.0,
+        focal2=1.0,
+        index=1.5,
+        thickness=0.0,
     ) -> None:
-        self.location: VecArg = asarray(location)
-        self.rotation = rotation
-        self.scale = scale
-        self.focal1 = focal1
-        self.focal2 = focal2
+        super().__init__()
+        self.__location: VecArg = _frozen(location)
+        self.__rotation: Angle = rotation
+        self.__scale: float = scale
+        self.__focal1: float = focal1
+        self.__focal2: float = focal2
+        self.__index: float = index
+        self.__thickness: float = thickness
 
-    def get_bounce(self, ray: RayEmitter) -> tuple[VecArg, float] | None:
-        return None
+    @property
+    def location(self) -> VecArg: # pylint: disable=C0116
+        return self.__location
+
+    @location.setter
+    def location(self, value: VecArg) -> None:
+        self.__location = _frozen(value)
+        self._touch()
+
+    @property
+    def rotation(self): # pylint: disable=C0116
+        return self.__rotation
+
+    @rotation.setter
+    def rotation(self, value):
+        self.__rotation = value
+        self._touch()
+
+    @property
+    def scale(self): # pylint: disable=C0116
+        return self.__scale
+
+    @scale.setter
+    def scale(self, value):
+        self.__scale = value
+        self._touch()
+
+    @property
+    def focal1(self): # pylint: disable=C0116
+        return self.__focal1
+
+    @focal1.setter
+    def focal1(self, value):
+        self.__focal1 = value
+        self._touch()
+
+    @property
+    def focal2(self): # pylint: disable=C0116
+        return self.__focal2
+
+    @focal2.setter
+    def focal2(self, value):
+        self.__focal2 = value
+        self._touch()
+
+    @property
+    def index(self): # pylint: disable=C0116
+        return self.__index
+
+    @index.setter
+    def index(self, value):
+        self.__index = value
+        self._touch()
+
+    @property
+    def thickness(self): # pylint: disable=C0116
+        return self.__thickness
+
+    @thickness.setter
+    def thickness(self, value):
+        self.__thickness = value
+        self._touch()
+
+    @property
+    def power(self) -> float:
+        """Optical power (1 / focal length) of the lens as a thin lens, by the lensmaker's equation"""
+        return (self.index - 1) * (1 / (2 * self.focal1) + 1 / (2 * self.focal2))
+
+    def _compile(self) -> ThinLensGeometry | ThickLensGeometry:
+        location, rotation = self.location, self.rotation
+        axis = _angle_to_direction_vec(rotation)
+
+        if not self.thickness:
+            start, end = flat_endpoints(location, rotation + PI_HALF, self.scale)
+            return ThinLensGeometry(
+                start,
+                end,
+                axis,
+                self.power,
+                np.concatenate((np.minimum(start, end), np.maximum(start, end))),
+            )
+
+        # the back surface is the front surface of the lens turned around
+        half = self.thickness / 2
+        vertex = np.array((location + half * axis, location - half * axis))
+        rotations = np.array((rotation, rotation + PI))
+        center, radius, reach = spherical_geometry(
+            vertex, rotations, self.scale, np.array((self.focal1, self.focal2))
+        )
+        facing = rotations + np.where(radius < 0, PI, 0)
+        half_arc = np.arcsin(self.scale / np.abs(radius) / 2)
+        return ThickLensGeometry(
+            center,
+            radius,
+            vertex,
+            reach,
+            np.stack((facing - half_arc, facing + half_arc), axis=-1),
+            self.index,
+            np.concatenate(
+                (
+                    (vertex - reach[:, None]).min(axis=0),
+                    (vertex + reach[:, None]).max(axis=0),
+                )
+            ),
+        )
+
+    def get_bounce(self, ray: RayEmitter) -> tuple[VecArg, Angle] | None:
+        geometry: ThinLensGeometry | ThickLensGeometry = self.compiled
+
+        origin = np.asarray(ray.current_ray_location, dtype=float)[None]
+        direction = _angle_to_direction_vec(ray.last_bounce_direction)[None]
+
+        match geometry:
+            case ThinLensGeometry():
+                distance = intersect_segments(
+                    origin, direction, geometry.start[None], geometry.end[None]
+                )[0, 0]
+                if not np.isfinite(distance):
+                    return None
+                point = origin[0] + distance * direction[0]
+
+                tangent = _normalize(geometry.end - geometry.start)
+                new_direction = thin_lens(
+                    direction[0],
+                    geometry.axis,
+                    tangent,
+                    np.dot(point - self.location, tangent),
+                    geometry.power,
+                )
+            case _:
+                distances = intersect_spheres(
+                    origin,
+                    direction,
+                    geometry.center,
+                    geometry.radius,
+                    geometry.vertex,
+                    geometry.reach,
+                )[0]
+                surface = np.argmin(distances)
+                if not np.isfinite(distances[surface]):
+                    return None
+                point = origin[0] + distances[surface] * direction[0]
+
+                outward = (point - geometry.center[surface]) / geometry.radius[surface]
+                new_direction = refract(direction[0], _normalize(outward), geometry.index)
+
+        return point, _direction_vec_to_angle(new_direction)
 
 
 class FlatMirror(Optic):
     """A Flat mirror optic"""
 
+    __slots__ = ("__location", "__rotation", "__scale")
+
     def __init__(self, location, rotation: Angle, scale: float) -> None:
-        self.location = asarray(location)
-        self.rotation = rotation - PI_HALF
-        self.scale = scale
+        super().__init__()
+        self.__location = _frozen(location)
+        self.__rotation = rotation - PI_HALF
+        self.__scale = scale
+
+    @property
+    def location(self) -> VecArg: # pylint: disable=C0116
+        return self.__location
+
+    @location.setter
+    def location(self, value: VecArg) -> None:
+        self.__location = _frozen(value)
+        self._touch()
+
+    @property
+    def rotation(self): # pylint: disable=C0116
+        return self.__rotation
+
+    @rotation.setter
+    def rotation(self, value):
+        self.__rotation = value
+        self._touch()
+
+    @property
+    def scale(self): # pylint: disable=C0116
+        return self.__scale
+
+    @scale.setter
+    def scale(self, value):
+        self.__scale = value
+        self._touch()
+
+    def _compile(self) -> FlatGeometry:
+        start, end = flat_endpoints(self.location, self.rotation, self.scale)
+        direction = _angle_to_direction_vec(self.rotation)
+        return FlatGeometry(
+            start,
+            end,
+            direction,
+            np.array((-direction[1], direction[0])),
+            np.concatenate((np.minimum(start, end), np.maximum(start, end))),
+        )
 
     def _get_intersection(
         self, prev_location: VecArg, direction: Angle
     ) -> VecArg | None:
+        geometry: FlatGeometry = self.compiled
 
-        self_a = tan(self.rotation)
-        ray_a = tan(direction)
-
-        self_b = self.location[1] - self_a * self.location[0]
-        ray_b = prev_location[1] - ray_a * prev_location[0]
-
-        d = np.linalg.det(((self_a, 1), (ray_a, 1)))
+        ray_dir = _angle_to_direction_vec(direction)
+        d = _cross(ray_dir, geometry.direction)
         if d == 0:
             return None
 
-        dx = -np.linalg.det(((self_b, 1), (ray_b, 1)))
-        dy = np.linalg.det(((self_a, self_b), (ray_a, ray_b)))
-
-        x = dx / d
-        y = dy / d
-
-        point = asarray((x, y))
-        if _distance(point, self.location) > self.scale / 2:
+        # position along the mirror, measured from its middle
+        offset = _cross(self.location - prev_location, ray_dir) / d
+        if abs(offset) > self.scale / 2:
             return None
 
-        return point
+        return self.location + offset * geometry.direction
 
     def get_bounce(self, ray) -> tuple[VecArg, float] | None:
         point = self._get_intersection(
@@ -146,40 +459,28 @@ class FlatMirror(Optic):
 class SphericalMirror(Optic):
     """A spherical mirror optic"""
 
+    __slots__ = ("__location", "__rotation", "__chord_len", "__focal")
+
     def __init__(
         self, location, rotation: Angle, chord: float, focal: float = 1
     ) -> None:
         """
         Describe a spherical mirror by the location of its center, rotation, chord and focal length
         """
-        self.__location = asarray(location)
+        super().__init__()
+        self.__location = _frozen(location)
         self.__rotation: Angle = rotation
         self.__chord_len: float = chord
         self.__focal = focal
 
-        self.__radius = self.__focal * 2
-
-        self._center_x = self.__location[0] - self.__radius * cos(self.__rotation)
-        self._center_y = self.__location[1] - self.__radius * sin(self.__rotation)
-        self._center = np.array((self._center_x, self._center_y))
-
-        self._max_distance = sqrt(
-            (self.__chord_len / 2) ** 2
-            + (self.__radius - sqrt(self.__radius**2 - (self.__chord_len / 2) ** 2))
-            ** 2
-        )  # arc_angle_fourth
-
     @property
     def location(self) -> VecArg: # pylint: disable=C0116
         return self.__location
 
     @location.setter
     def location(self, value: VecArg) -> None:
-        self.__location = value
-
-        self._center_x = self.__location[0] - self.__radius * cos(self.__rotation)
-        self._center_y = self.__location[1] - self.__radius * sin(self.__rotation)
-        self._center = np.array((self._center_x, self._center_y))
+        self.__location = _frozen(value)
+        self._touch()
 
     @property
     def rotation(self): # pylint: disable=C0116
@@ -188,10 +489,7 @@ class SphericalMirror(Optic):
     @rotation.setter
     def rotation(self, value):
         self.__rotation = value
-
-        self._center_x = self.__location[0] - self.__radius * cos(self.__rotation)
-        self._center_y = self.__location[1] - self.__radius * sin(self.__rotation)
-        self._center = np.array((self._center_x, self._center_y))
+        self._touch()
 
     @property
     def scale(self): # pylint: disable=C0116 # Pylint enforces docstrins on properties? Why?
@@ -200,12 +498,7 @@ class SphericalMirror(Optic):
     @scale.setter
     def scale(self, value):
         self.__chord_len = value
-
-        self._max_distance = sqrt(
-            (self.__chord_len / 2) ** 2
-            + (self.__radius - sqrt(self.__radius**2 - (self.__chord_len / 2) ** 2))
-            ** 2
-        )
+        self._touch()
 
     @property
     def focal(self): # pylint: disable=C0116
@@ -214,27 +507,34 @@ class SphericalMirror(Optic):
     @focal.setter
     def focal(self, value):
         self.__focal = value
-        
-        self.__radius = 2*value
-        self._center_x = self.__location[0] - self.__radius * cos(self.__rotation)
-        self._center_y = self.__location[1] - self.__radius * sin(self.__rotation)
-        self._center = np.array((self._center_x, self._center_y))
-
-        self._max_distance = sqrt(
-            (self.__chord_len / 2) ** 2
-            + (self.__radius - sqrt(self.__radius**2 - (self.__chord_len / 2) ** 2))
-            ** 2
+        self._touch()
+
+    def _compile(self) -> SphericalGeometry:
+        location, rotation = self.location, self.rotation
+        center, radius, reach = spherical_geometry(
+            location, rotation, self.scale, self.focal
+        )
+        # a negative radius puts the center in front of the mirror, which it then faces
+        facing = rotation + (PI if radius < 0 else 0)
+        half_arc = asin(self.scale / abs(radius) / 2)
+        return SphericalGeometry(
+            center,
+            float(radius),
+            float(radius**2),
+            location,
+            float(reach),
+            (facing - half_arc, facing + half_arc),
+            np.concatenate((location - reach, location + reach)),
         )
 
     def __calculate_delta(self, prev_location, direction) -> tuple[float, float] | None:
         a, b = prev_location
         c, d = _angle_to_direction_vec(direction)
-        m = self._center_x
-        n = self._center_y
-        r = self.__radius
+        m, n = self.compiled.center
+        r_sq = self.compiled.radius_sq
         under_root = 4 * (a * c + b * d - c * m - d * n) ** 2 - 4 * (
             c**2 + d**2
-        ) * (a**2 - 2 * a * m + b**2 - 2 * b * n + m**2 + n**2 - r**2)
+        ) * (a**2 - 2 * a * m + b**2 - 2 * b * n + m**2 + n**2 - r_sq)
 
         if under_root < 0:
             return None
@@ -263,8 +563,9 @@ class SphericalMirror(Optic):
         point1 = prev_location + dir_vec * distance1
         point2 = prev_location + dir_vec * distance2
 
-        ret1 = _distance(point1, self.location) <= self._max_distance and distance1 > 0
-        ret2 = _distance(point2, self.location) <= self._max_distance and distance2 > 0
+        reach = self.compiled.reach
+        ret1 = _distance(point1, self.location) <= reach and distance1 > 0
+        ret2 = _distance(point2, self.location) <= reach and distance2 > 0
 
         if ret1 and ret2:
             if distance1 < distance2 or isclose(distance2, 0, abs_tol=1e-14):
@@ -284,17 +585,184 @@ class SphericalMirror(Optic):
         if p_inter is None:
             return None
 
-        radius_vec = _normalize(p_inter - self._center)
+        radius_vec = _normalize(p_inter - self.compiled.center)
 
         dir_vec = _angle_to_direction_vec(dir_angle)
         # check if pointing in the same direction
         if np.dot(radius_vec, dir_vec) < 0:
             radius_vec = -radius_vec
 
-        ang = _direction_vec_to_angle(dir_vec - 2 * radius_vec)
+        ang = _direction_vec_to_angle(
+            dir_vec - 2 * np.dot(dir_vec, radius_vec) * radius_vec
+        )
         return (p_inter, ang)
 
 
+class PolylineMirror(Optic):
+    """A mirror made of a chain of flat segments"""
+
+    # number of consecutive segments sharing one bounding box of the segment index
+    BLOCK_SIZE = 16
+
+    __slots__ = ("__location", "__rotation", "__scale", "__vertices", "__smooth")
+
+    def __init__(
+        self,
+        location,
+        rotation: Angle,
+        vertices,
+        scale: float = 1,
+        smooth: bool = False,
+    ) -> None:
+        """
+        Describe a polyline mirror by its vertices, given relative to `location` before
+        rotating and scaling. A smooth mirror interpolates the normals of its vertices
+        along every segment instead of using the flat normal of the segment.
+        Repeated consecutive vertices are dropped.
+        """
+        super().__init__()
+        self.__location = _frozen(location)
+        self.__rotation: Angle = rotation
+        self.__scale: float = scale
+        self.__vertices = self._distinct(vertices)
+        self.__smooth = smooth
+
+    @property
+    def location(self) -> VecArg: # pylint: disable=C0116
+        return self.__location
+
+    @location.setter
+    def location(self, value: VecArg) -> None:
+        self.__location = _frozen(value)
+        self._touch()
+
+    @property
+    def rotation(self): # pylint: disable=C0116
+        return self.__rotation
+
+    @rotation.setter
+    def rotation(self, value):
+        self.__rotation = value
+        self._touch()
+
+    @property
+    def scale(self): # pylint: disable=C0116
+        return self.__scale
+
+    @scale.setter
+    def scale(self, value):
+        self.__scale = value
+        self._touch()
+
+    @property
+    def vertices(self) -> np.ndarray: # pylint: disable=C0116
+        return self.__vertices
+
+    @vertices.setter
+    def vertices(self, value) -> None:
+        self.__vertices = self._distinct(value)
+        self._touch()
+
+    @staticmethod
+    def _distinct(vertices) -> np.ndarray:
+        """Vertices without consecutive duplicates, which would form segments without a normal"""
+        vertices = np.asarray(vertices, dtype=float).reshape(-1, 2)
+        keep = np.concatenate(([True], (np.diff(vertices, axis=0) != 0).any(axis=1)))
+        if keep.sum() < 2:
+            raise ValueError("A PolylineMirror needs at least 2 distinct vertices")
+        return _frozen(vertices[keep])
+
+    @property
+    def smooth(self) -> bool: # pylint: disable=C0116
+        return self.__smooth
+
+    @smooth.setter
+    def smooth(self, value: bool) -> None:
+        self.__smooth = value
+        self._touch()
+
+    def _compile(self) -> PolylineGeometry:
+        cos_r, sin_r = cos(self.rotation), sin(self.rotation)
+        rotation = np.array(((cos_r, sin_r), (-sin_r, cos_r)))
+        vertices = self.location + self.scale * self.vertices @ rotation
+
+        start, end = vertices[:-1], vertices[1:]
+        seg = end - start
+        normals = np.stack((-seg[:, 1], seg[:, 0]), axis=-1)
+        normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+
+        if self.smooth:
+            # every inner vertex gets the mean normal of both of its segments
+            at_vertex = np.concatenate(
+                (normals[:1], normals[:-1] + normals[1:], normals[-1:])
+            )
+            at_vertex /= np.linalg.norm(at_vertex, axis=-1, keepdims=True)
+            vertex_normals = np.stack((at_vertex[:-1], at_vertex[1:]), axis=1)
+        else:
+            vertex_normals = np.stack((normals, normals), axis=1)
+
+        return PolylineGeometry(
+            vertices,
+            start,
+            end,
+            normals,
+            vertex_normals,
+            segment_blocks(start, end, self.BLOCK_SIZE),
+            np.concatenate((vertices.min(axis=0), vertices.max(axis=0))),
+        )
+
+    def get_bounce(self, ray: RayEmitter) -> tuple[VecArg, Angle] | None:
+        geometry: PolylineGeometry = self.compiled
+
+        origin = np.asarray(ray.current_ray_location, dtype=float)[None]
+        direction = _angle_to_direction_vec(ray.last_bounce_direction)[None]
+
+        # only test the segments of blocks the ray passes through
+        blocks = np.flatnonzero(ray_box_overlap(origin, direction, geometry.blocks)[0])
+        if not blocks.size:
+            return None
+        segments = (blocks[:, None] * self.BLOCK_SIZE + np.arange(self.BLOCK_SIZE)).ravel()
+        segments = segments[segments < len(geometry.start)]
+
+        distances = intersect_segments(
+            origin, direction, geometry.start[segments], geometry.end[segments]
+        )[0]
+        nearest = np.argmin(distances)
+        if not np.isfinite(distances[nearest]):
+            return None
+
+        segment = segments[nearest]
+        point = origin[0] + distances[nearest] * direction[0]
+
+        seg = geometry.end[segment] - geometry.start[segment]
+        along = np.dot(point - geometry.start[segment], seg) / np.dot(seg, seg)
+        first, last = geometry.vertex_normals[segment]
+        normal = _normalize((1 - along) * first + along * last)
+
+        return point, _direction_vec_to_angle(reflect(direction[0], normal))
+
+
+class CompiledScene(NamedTuple):
+    """
+    Immutable snapshot of the geometry of an `OpticSystem`, as returned by `OpticSystem.compile`.
+
+    Optics are ordered: flat mirrors, polyline mirrors, thin lenses, spherical mirrors,
+    thick lenses. Every flat mirror, every segment of a polyline mirror and every thin
+    lens is a flat row of the geometry, spherical mirrors and both surfaces of every
+    thick lens follow as sphere rows. Optic `i` owns the rows `offsets[i]:offsets[i + 1]`,
+    counting flat rows first and sphere rows after them.
+    """
+
+    optics: Sequence[Optic]
+    versions: Sequence[int]
+    offsets: np.ndarray  # (len(optics) + 1,)
+    geometry: Geometry
+    flat_normal: np.ndarray  # (N, 2)
+    sphere_radius_sq: np.ndarray  # (N,)
+    sphere_arc: np.ndarray  # (N, 2)
+    bounds: np.ndarray  # (len(optics), 4)
+
+
 class OpticSystem:
     """A system of optics. Agregates laser ray emitters and optics, and runs the simulation"""
 
@@ -311,31 +779,106 @@ class OpticSystem:
         self.optics: list[Optic] = list(optics)
         self.rays: list[RayEmitter] = list(rays)
 
+        self._snapshot: CompiledScene | None = None
+
     def reset(self) -> None:
         """Reset all light emitters"""
         for i in self.rays:
             i.reset()
 
-    def add(self, obj: Optic | RayEmitter):
-        """Add an optic or a light source into the simulation"""
+    def add(self, obj: Optic | RayEmitter) -> Optic | RayEmitter:
+        """Add an optic or a light source into the simulation and return the stored object"""
         if isinstance(obj, Optic):
             self.optics.append(obj)
         else:
             self.rays.append(obj)
+        return obj
 
-    def step(self) -> bool:
+    def remove(self, obj: Optic | RayEmitter) -> None:
+        """Remove an optic or a light source from the simulation"""
+        if isinstance(obj, Optic):
+            self.optics.remove(obj)
+        else:
+            self.rays.remove(obj)
+
+    def compile(self) -> CompiledScene:
+        """
+        Return an immutable snapshot of the geometry of all optics.
+
+        The previous snapshot is reused as long as no optic changed, otherwise only
+        the rows of optics whose version was bumped since are recomputed.
+        """
+        flats = [o for o in self.optics if isinstance(o, FlatMirror)]
+        polylines = [o for o in self.optics if isinstance(o, PolylineMirror)]
+        spheres = [o for o in self.optics if isinstance(o, SphericalMirror)]
+        lenses = [o for o in self.optics if isinstance(o, Lens)]
+        thin = [o for o in lenses if isinstance(o.compiled, ThinLensGeometry)]
+        thick = [o for o in lenses if isinstance(o.compiled, ThickLensGeometry)]
+        optics = tuple(flats + polylines + thin + spheres + thick)
+        versions = tuple(o.version for o in optics)
+
+        old = self._snapshot
+        if old is not None and old.optics == optics and old.versions == versions:
+            return old
+
+        offsets = np.cumsum(
+            [0]
+            + [1] * len(flats)
+            + [len(o.compiled.start) for o in polylines]
+            + [1] * (len(thin) + len(spheres))
+            + [2] * len(thick)
+        )
+        flat_rows = int(offsets[len(flats) + len(polylines) + len(thin)])
+
+        if old is not None and old.optics == optics and np.array_equal(
+            old.offsets, offsets
+        ):
+            arrays = _copy_scene_arrays(old)
+            dirty = [i for i, (a, b) in enumerate(zip(old.versions, versions)) if a != b]
+        else:
+            arrays = _empty_scene_arrays(
+                flat_rows, int(offsets[-1]) - flat_rows, len(optics)
+            )
+            dirty = range(len(optics))
+
+        for i in dirty:
+            rows = slice(offsets[i], offsets[i + 1])
+            _fill_scene_rows(arrays, i, rows, flat_rows, optics[i].compiled)
+
+        self._snapshot = _freeze_scene(optics, versions, offsets, arrays)
+        return self._snapshot
+
+    def trace(self, steps: int) -> TraceResult:
+        """
+        Trace all emitters at once with the vectorized kernels.
+
+        Unlike `step`, the state of the emitters is left untouched.
+        """
+        scene = self.compile()
+        origins = np.array([r.location for r in self.rays], dtype=float).reshape(-1, 2)
+        directions = unit_vectors([r.rotation for r in self.rays]).reshape(-1, 2)
+        return _trace(scene.geometry, origins, directions, steps)
+
+    def step(self, rays: Sequence[RayEmitter] | None = None) -> bool:
         """
         Progress the simulation.
 
+        Parameters
+        ----------
+        rays : Sequence[RayEmitter], optional
+            Only progress these rays, all rays of the system by default.
+
         Returns
         -------
         bool
             True if nothing changed and the simulation should end, False otherwise.
         """
+        if rays is None:
+            rays = self.rays
 
         fin = 0
 
-        for ray in self.rays:
+        for ray in rays:
             loc = ray.current_ray_location
             direction = ray.last_bounce_direction
 
@@ -374,7 +917,117 @@ class OpticSystem:
                 ray.current_ray_location = new_loc
                 ray.last_bounce_direction = new_direction
 
-        return fin == len(self.rays)
+        return fin == len(rays)
+
+
+def _empty_scene_arrays(
+    flat_count: int, sphere_count: int, optic_count: int
+) -> dict[str, np.ndarray]:
+    return {
+        "flat_start": np.empty((flat_count, 2)),
+        "flat_end": np.empty((flat_count, 2)),
+        "sphere_center": np.empty((sphere_count, 2)),
+        "sphere_radius": np.empty(sphere_count),
+        "sphere_vertex": np.empty((sphere_count, 2)),
+        "sphere_reach": np.empty(sphere_count),
+        "flat_vertex_normals": np.empty((flat_count, 2, 2)),
+        "flat_power": np.full(flat_count, np.nan),
+        "sphere_index": np.full(sphere_count, np.nan),
+        "flat_normal": np.empty((flat_count, 2)),
+        "sphere_radius_sq": np.empty(sphere_count),
+        "sphere_arc": np.empty((sphere_count, 2)),
+        "bounds": np.empty((optic_count, 4)),
+    }
+
+
+def _copy_scene_arrays(scene: CompiledScene) -> dict[str, np.ndarray]:
+    arrays = {name: getattr(scene.geometry, name).copy() for name in Geometry._fields}
+    arrays.update(
+        flat_normal=scene.flat_normal.copy(),
+        sphere_radius_sq=scene.sphere_radius_sq.copy(),
+        sphere_arc=scene.sphere_arc.copy(),
+        bounds=scene.bounds.copy(),
+    )
+    return arrays
+
+
+def _freeze_scene(
+    optics: Sequence[Optic],
+    versions: Sequence[int],
+    offsets: np.ndarray,
+    arrays: dict[str, np.ndarray],
+) -> CompiledScene:
+    # blocks of flat rows, so that `trace` can skip most segments of long polylines
+    arrays["flat_blocks"] = segment_blocks(arrays["flat_start"], arrays["flat_end"])
+    for array in arrays.values():
+        array.flags.writeable = False
+
+    return CompiledScene(
+        optics,
+        versions,
+        offsets,
+        Geometry(**{name: arrays.pop(name) for name in Geometry._fields}),
+        **arrays,
+    )
+
+
+def _fill_scene_rows(
+    arrays: dict[str, np.ndarray],
+    index: int,
+    rows: slice,
+    flat_count: int,
+    geometry: FlatGeometry
+    | PolylineGeometry
+    | SphericalGeometry
+    | ThinLensGeometry
+    | ThickLensGeometry,
+) -> None:
+    arrays["bounds"][index] = geometry.bounds
+    match geometry:
+        case FlatGeometry():
+            arrays["flat_start"][rows] = geometry.start
+            arrays["flat_end"][rows] = geometry.end
+            arrays["flat_normal"][rows] = geometry.normal
+            arrays["flat_vertex_normals"][rows] = geometry.normal
+        case PolylineGeometry():
+            arrays["flat_start"][rows] = geometry.start
+            arrays["flat_end"][rows] = geometry.end
+            arrays["flat_normal"][rows] = geometry.normals
+            arrays["flat_vertex_normals"][rows] = geometry.vertex_normals
+        case SphericalGeometry():
+            row = rows.start - flat_count
+            arrays["sphere_center"][row] = geometry.center
+            arrays["sphere_radius"][row] = geometry.radius
+            arrays["sphere_vertex"][row] = geometry.vertex
+            arrays["sphere_reach"][row] = geometry.reach
+            arrays["sphere_radius_sq"][row] = geometry.radius_sq
+            arrays["sphere_arc"][row] = geometry.arc
+        case ThinLensGeometry():
+            arrays["flat_start"][rows] = geometry.start
+            arrays["flat_end"][rows] = geometry.end
+            arrays["flat_normal"][rows] = geometry.axis
+            arrays["flat_vertex_normals"][rows] = geometry.axis
+            arrays["flat_power"][rows] = geometry.power
+        case ThickLensGeometry():
+            rows = slice(rows.start - flat_count, rows.stop - flat_count)
+            arrays["sphere_center"][rows] = geometry.center
+            arrays["sphere_radius"][rows] = geometry.radius
+            arrays["sphere_vertex"][rows] = geometry.vertex
+            arrays["sphere_reach"][rows] = geometry.reach
+            arrays["sphere_radius_sq"][rows] = geometry.radius**2
+            arrays["sphere_arc"][rows] = geometry.arc
+            arrays["sphere_index"][rows] = geometry.index
+
+
+def _frozen(value) -> VecArg:
+    """A read-only copy of an array, changes have to go through the setters bumping `version`"""
+    array = np.array(value, dtype=float)
+    array.flags.writeable = False
+    return array
+
+
+def _cross(a: VecArg, b: VecArg) -> float:
+    return a[0] * b[1] - a[1] * b[0]
 
 
 def _distance(point_a: VecArg, point_b: VecArg):
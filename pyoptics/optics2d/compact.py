@@ -0,0 +1,458 @@
+"""
+Compact, array-backed optic systems for scenes with a very large number of objects.
+
+A `CompactOpticSystem` keeps the attributes of all of its mirrors and emitters in
+column arrays. The objects found in its `optics` and `rays` sequences are created
+on access and are only lightweight views into those columns, so they can be used
+(and modified) just like regular `FlatMirror`, `SphericalMirror` and `RayEmitter` instances.
+
+Lenses and polyline mirrors cannot be stored in columns, scenes containing them
+have to use a regular `OpticSystem`.
+"""
+
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from . import (
+    PI_HALF,
+    CompiledScene,
+    FlatMirror,
+    Optic,
+    OpticSystem,
+    RayEmitter,
+    SphericalMirror,
+    VecArg,
+    _copy_scene_arrays,
+    _empty_scene_arrays,
+    _freeze_scene,
+)
+from .kernels import (
+    TraceResult,
+    flat_endpoints,
+    spherical_geometry,
+    trace as _trace,
+    unit_vectors,
+)
+
+
+__all__ = [
+    "CompactOpticSystem",
+    "FlatMirrorView",
+    "SphericalMirrorView",
+    "RayEmitterView",
+]
+
+
+class _Columns:
+    """Growable column arrays holding one kind of objects"""
+
+    def __init__(self, **columns: tuple[int, ...]) -> None:
+        self.size = 0
+        self._shapes = columns
+        self._arrays = {
+            name: np.zeros((8,) + shape) for name, shape in columns.items()
+        }
+        # increasing key of every row, views refer to rows by it so they survive removals
+        self._keys = np.zeros(8, dtype=np.int64)
+        self._next_key = 0
+        # ray paths by key, only stored for rays that have been stepped
+        self.paths: dict[int, list[VecArg]] = {}
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def append(self, **values) -> int:
+        """Append a row and return its key"""
+        if self.size == len(self._keys):
+            for name, array in self._arrays.items():
+                grown = np.zeros((2 * len(array),) + self._shapes[name])
+                grown[: self.size] = array
+                self._arrays[name] = grown
+            self._keys = np.concatenate((self._keys, np.zeros_like(self._keys)))
+        for name, value in values.items():
+            self._arrays[name][self.size] = value
+        self._keys[self.size] = self._next_key
+        self._next_key += 1
+        self.size += 1
+        return self._next_key - 1
+
+    def key(self, row: int) -> int:
+        """Key of the object stored in a row"""
+        return int(self._keys[row])
+
+    def row(self, key: int) -> int:
+        """Row the object with the given key is currently stored in"""
+        keys = self._keys[: self.size]
+        row = int(np.searchsorted(keys, key))
+        if row == self.size or keys[row] != key:
+            raise LookupError("The object has been removed from its system")
+        return row
+
+    def remove(self, row: int) -> None:
+        """Remove a row, moving all rows after it one up"""
+        self.paths.pop(self.key(row), None)
+        for array in list(self._arrays.values()) + [self._keys]:
+            array[row : self.size - 1] = array[row + 1 : self.size]
+        self.size -= 1
+
+    def view(self, name: str) -> np.ndarray:
+        """The used part of a column"""
+        return self._arrays[name][: self.size]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the column arrays"""
+        return self._keys.nbytes + sum(array.nbytes for array in self._arrays.values())
+
+
+class _View:
+    """Mixin for objects backed by a row of `_Columns`"""
+
+    __slots__ = ()
+
+    _columns: _Columns
+    _key: int
+
+    @property
+    def _index(self) -> int:
+        return self._columns.row(self._key)
+
+    def __eq__(self, other) -> bool:
+        return (
+            type(other) is type(self)
+            and other._columns is self._columns
+            and other._key == self._key
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self._columns), self._key))
+
+
+class FlatMirrorView(_View, FlatMirror):
+    """A `FlatMirror` stored in a `CompactOpticSystem`"""
+
+    __slots__ = ("_columns", "_key")
+
+    def __init__(  # pylint: disable=W0231 # the storage is owned by the columns
+        self, columns: _Columns, key: int
+    ) -> None:
+        self._columns = columns
+        self._key = key
+        self._compiled = None
+        self._compiled_version = -1
+
+    @property
+    def version(self) -> int:  # type: ignore # pylint: disable=C0116
+        return int(self._columns["version"][self._index])
+
+    @property
+    def location(self) -> VecArg: # pylint: disable=C0116
+        return self._columns["location"][self._index].copy()
+
+    @location.setter
+    def location(self, value: VecArg) -> None:
+        self._columns["location"][self._index] = value
+        self._columns["version"][self._index] += 1
+
+    @property
+    def rotation(self): # pylint: disable=C0116
+        return float(self._columns["rotation"][self._index])
+
+    @rotation.setter
+    def rotation(self, value):
+        self._columns["rotation"][self._index] = value
+        self._columns["version"][self._index] += 1
+
+    @property
+    def scale(self): # pylint: disable=C0116
+        return float(self._columns["scale"][self._index])
+
+    @scale.setter
+    def scale(self, value):
+        self._columns["scale"][self._index] = value
+        self._columns["version"][self._index] += 1
+
+
+class SphericalMirrorView(_View, SphericalMirror):
+    """A `SphericalMirror` stored in a `CompactOpticSystem`"""
+
+    __slots__ = ("_columns", "_key")
+
+    def __init__(  # pylint: disable=W0231 # the storage is owned by the columns
+        self, columns: _Columns, key: int
+    ) -> None:
+        self._columns = columns
+        self._key = key
+        self._compiled = None
+        self._compiled_version = -1
+
+    @property
+    def version(self) -> int:  # type: ignore # pylint: disable=C0116
+        return int(self._columns["version"][self._index])
+
+    @property
+    def location(self) -> VecArg: # pylint: disable=C0116
+        return self._columns["location"][self._index].copy()
+
+    @location.setter
+    def location(self, value: VecArg) -> None:
+        self._columns["location"][self._index] = value
+        self._columns["version"][self._index] += 1
+
+    @property
+    def rotation(self): # pylint: disable=C0116
+        return float(self._columns["rotation"][self._index])
+
+    @rotation.setter
+    def rotation(self, value):
+        self._columns["rotation"][self._index] = value
+        self._columns["version"][self._index] += 1
+
+    @property
+    def scale(self): # pylint: disable=C0116
+        return float(self._columns["scale"][self._index])
+
+    @scale.setter
+    def scale(self, value):
+        self._columns["scale"][self._index] = value
+        self._columns["version"][self._index] += 1
+
+    @property
+    def focal(self): # pylint: disable=C0116
+        return float(self._columns["focal"][self._index])
+
+    @focal.setter
+    def focal(self, value):
+        self._columns["focal"][self._index] = value
+        self._columns["version"][self._index] += 1
+
+
+class RayEmitterView(_View, RayEmitter):
+    """A `RayEmitter` stored in a `CompactOpticSystem`"""
+
+    __slots__ = ("_columns", "_key")
+
+    def __init__(  # pylint: disable=W0231 # the storage is owned by the columns
+        self, columns: _Columns, key: int
+    ) -> None:
+        self._columns = columns
+        self._key = key
+
+    @property
+    def location(self) -> VecArg: # pylint: disable=C0116
+        return self._columns["location"][self._index].copy()
+
+    @location.setter
+    def location(self, value: VecArg) -> None:
+        self._columns["location"][self._index] = value
+
+    @property
+    def rotation(self): # pylint: disable=C0116
+        return float(self._columns["rotation"][self._index])
+
+    @rotation.setter
+    def rotation(self, value):
+        self._columns["rotation"][self._index] = value
+
+    @property
+    def current_ray_location(self) -> VecArg: # pylint: disable=C0116
+        return self._columns["current"][self._index].copy()
+
+    @current_ray_location.setter
+    def current_ray_location(self, value: VecArg) -> None:
+        self._columns["current"][self._index] = value
+
+    @property
+    def last_bounce_direction(self): # pylint: disable=C0116
+        return float(self._columns["direction"][self._index])
+
+    @last_bounce_direction.setter
+    def last_bounce_direction(self, value):
+        self._columns["direction"][self._index] = value
+
+    @property
+    def bounce_locations(self) -> list[VecArg]: # pylint: disable=C0116
+        return self._columns.paths.setdefault(self._key, [])
+
+    @bounce_locations.setter
+    def bounce_locations(self, value: list[VecArg]) -> None:
+        self._columns.paths[self._key] = value
+
+
+class _ViewList(Sequence):
+    """A list-like sequence creating views into one or more `_Columns` on access"""
+
+    def __init__(self, system: "CompactOpticSystem", parts) -> None:
+        self._system = system
+        self._parts: list[tuple[_Columns, type]] = parts
+
+    def __len__(self) -> int:
+        return sum(columns.size for columns, _ in self._parts)
+
+    def __getitem__(self, index):  # type: ignore
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        for columns, view in self._parts:
+            if 0 <= index < columns.size:
+                return view(columns, columns.key(index))
+            index -= columns.size
+        raise IndexError("view index out of range")
+
+    def __add__(self, other) -> list:
+        return list(self) + list(other)
+
+    def append(self, obj) -> None:
+        """Copy `obj` into the system"""
+        self._system.add(obj)
+
+    def remove(self, obj) -> None:
+        """Remove the object a view points to, compacting its columns"""
+        for columns, view in self._parts:
+            if isinstance(obj, view) and obj._columns is columns:
+                columns.remove(obj._index)
+                # rows moved, the previous snapshot cannot be patched
+                self._system._snapshot = None
+                return
+        raise ValueError(f"{type(obj).__name__} is not stored in this system")
+
+
+class CompactOpticSystem(OpticSystem):
+    """
+    An `OpticSystem` storing flat mirrors, spherical mirrors and emitters in column arrays.
+
+    Objects passed in are copied into the columns, use the views returned by
+    `add` (or found in `optics` and `rays`) to modify or remove them afterwards.
+    Flat mirrors are always listed before spherical mirrors. Lenses and polyline
+    mirrors are not supported.
+    """
+
+    def __init__(
+        self,
+        optics: Iterable[Optic] | None = None,
+        rays: Iterable[RayEmitter] | None = None,
+    ) -> None:
+        super().__init__()
+
+        self._flats = _Columns(location=(2,), rotation=(), scale=(), version=())
+        self._spheres = _Columns(
+            location=(2,), rotation=(), scale=(), focal=(), version=()
+        )
+        self._rays = _Columns(location=(2,), rotation=(), current=(2,), direction=())
+
+        self.optics = _ViewList(  # type: ignore
+            self, [(self._flats, FlatMirrorView), (self._spheres, SphericalMirrorView)]
+        )
+        self.rays = _ViewList(self, [(self._rays, RayEmitterView)])  # type: ignore
+
+        for obj in list(optics or []) + list(rays or []):
+            self.add(obj)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the column arrays of this system"""
+        return self._flats.nbytes + self._spheres.nbytes + self._rays.nbytes
+
+    def add(self, obj: Optic | RayEmitter) -> Optic | RayEmitter:
+        match obj:
+            case FlatMirror():
+                key = self._flats.append(
+                    location=obj.location, rotation=obj.rotation, scale=obj.scale
+                )
+                return FlatMirrorView(self._flats, key)
+            case SphericalMirror():
+                key = self._spheres.append(
+                    location=obj.location,
+                    rotation=obj.rotation,
+                    scale=obj.scale,
+                    focal=obj.focal,
+                )
+                return SphericalMirrorView(self._spheres, key)
+            case RayEmitter():
+                key = self._rays.append(
+                    location=obj.location,
+                    rotation=obj.rotation,
+                    current=obj.location,
+                    direction=obj.rotation,
+                )
+                return RayEmitterView(self._rays, key)
+            case _:
+                raise TypeError(
+                    f"{type(obj).__name__} cannot be stored in a CompactOpticSystem, "
+                    "use a regular OpticSystem for scenes with lenses or polyline mirrors"
+                )
+
+    def reset(self) -> None:
+        self._rays.view("current")[:] = self._rays.view("location")
+        self._rays.view("direction")[:] = self._rays.view("rotation")
+        self._rays.paths = {}
+
+    def compile(self) -> CompiledScene:
+        flat_count, sphere_count = self._flats.size, self._spheres.size
+        versions = np.concatenate(
+            (self._flats.view("version"), self._spheres.view("version"))
+        )
+
+        old = self._snapshot
+        if old is not None and len(old.versions) == len(versions) and len(
+            old.geometry.flat_start
+        ) == flat_count:
+            dirty = np.flatnonzero(old.versions != versions)
+            if not dirty.size:
+                return old
+            arrays = _copy_scene_arrays(old)
+        else:
+            dirty = np.arange(flat_count + sphere_count)
+            arrays = _empty_scene_arrays(
+                flat_count, sphere_count, flat_count + sphere_count
+            )
+
+        rows = dirty[dirty < flat_count]
+        location = self._flats.view("location")[rows]
+        rotation = self._flats.view("rotation")[rows]
+        start, end = flat_endpoints(location, rotation, self._flats.view("scale")[rows])
+        arrays["flat_start"][rows] = start
+        arrays["flat_end"][rows] = end
+        arrays["flat_normal"][rows] = unit_vectors(rotation + PI_HALF)
+        arrays["flat_vertex_normals"][rows] = arrays["flat_normal"][rows][:, None]
+        arrays["bounds"][rows] = np.concatenate(
+            (np.minimum(start, end), np.maximum(start, end)), axis=-1
+        )
+
+        rows = dirty[dirty >= flat_count] - flat_count
+        location = self._spheres.view("location")[rows]
+        rotation = self._spheres.view("rotation")[rows]
+        chord = self._spheres.view("scale")[rows]
+        center, radius, reach = spherical_geometry(
+            location, rotation, chord, self._spheres.view("focal")[rows]
+        )
+        facing = rotation + np.where(radius < 0, np.pi, 0)
+        half_arc = np.arcsin(chord / np.abs(radius) / 2)
+        arrays["sphere_center"][rows] = center
+        arrays["sphere_radius"][rows] = radius
+        arrays["sphere_radius_sq"][rows] = radius**2
+        arrays["sphere_vertex"][rows] = location
+        arrays["sphere_reach"][rows] = reach
+        arrays["sphere_arc"][rows] = np.stack(
+            (facing - half_arc, facing + half_arc), axis=-1
+        )
+        arrays["bounds"][rows + flat_count] = np.concatenate(
+            (location - reach[:, None], location + reach[:, None]), axis=-1
+        )
+
+        versions.flags.writeable = False
+        offsets = np.arange(flat_count + sphere_count + 1)
+        self._snapshot = _freeze_scene(self.optics, versions, offsets, arrays)
+        return self._snapshot
+
+    def trace(self, steps: int) -> TraceResult:
+        scene = self.compile()
+        return _trace(
+            scene.geometry,
+            self._rays.view("location"),
+            unit_vectors(self._rays.view("rotation")),
+            steps,
+        )
+
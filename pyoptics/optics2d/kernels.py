@@ -0,0 +1,528 @@
+"""
+Vectorized ray tracing kernels.
+
+Every function here works on plain NumPy arrays and accepts arbitrary leading
+batch dimensions, so a single call can trace all rays of a scene, or all rays
+of a whole population of candidate scenes at once.
+Shapes use `N` for the number of optics of a kind and `R` for the number of rays.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+
+__all__ = [
+    "Geometry",
+    "TraceResult",
+    "unit_vectors",
+    "flat_endpoints",
+    "spherical_geometry",
+    "intersect_segments",
+    "intersect_spheres",
+    "ray_box_overlap",
+    "segment_box_overlap",
+    "segment_blocks",
+    "reflect",
+    "refract",
+    "thin_lens",
+    "trace",
+]
+
+
+BIG_NUMBER = 1000
+
+# minimal travel distance, prevents a ray from hitting the surface it has just left
+EPSILON = 1e-9
+
+# number of consecutive flat rows sharing a bounding box in `Geometry.flat_blocks`
+BLOCK_SIZE = 16
+
+
+class Geometry(NamedTuple):
+    """Array representation of the optics of a scene (or of a batch of scenes)"""
+
+    flat_start: np.ndarray  # (..., N, 2)
+    flat_end: np.ndarray  # (..., N, 2)
+    sphere_center: np.ndarray  # (..., N, 2)
+    sphere_radius: np.ndarray  # (..., N)
+    sphere_vertex: np.ndarray  # (..., N, 2)
+    sphere_reach: np.ndarray  # (..., N) max distance of the mirror edge from its vertex
+    # (..., N, 2, 2) normals at both ends of every flat segment, interpolated along it.
+    # If not given, the normal of the segment itself is used
+    flat_vertex_normals: np.ndarray | None = None
+    # (..., N) optical power (1 / focal length) of flat rows which are thin lenses,
+    # NaN for mirrors
+    flat_power: np.ndarray | None = None
+    # (..., N) refractive index of the glass behind sphere rows which are lens surfaces,
+    # NaN for mirrors. Lens surfaces bulge out of the glass for positive radii
+    sphere_index: np.ndarray | None = None
+    # (..., K, 4) bounds of every run of `BLOCK_SIZE` flat rows, see `segment_blocks`.
+    # If given, `trace` only tests rays against the flat rows of blocks in front of them
+    flat_blocks: np.ndarray | None = None
+
+
+class TraceResult(NamedTuple):
+    """Result of `trace`"""
+
+    points: np.ndarray  # (..., R, steps + 1, 2) ray paths, starting at the emitter
+    bounces: np.ndarray  # (..., R) number of times each ray changed direction
+
+    def endpoints(self) -> np.ndarray:
+        """Location of the last bounce of every ray (the emitter if it never bounced)"""
+        idx = self.bounces[..., None, None]
+        return np.take_along_axis(self.points, idx, axis=-2)[..., 0, :]
+
+
+def unit_vectors(angles) -> np.ndarray:
+    """Convert an array of angles into an array of unit direction vectors"""
+    angles = np.asarray(angles, dtype=float)
+    return np.stack((np.cos(angles), np.sin(angles)), axis=-1)
+
+
+def flat_endpoints(location, rotation, scale) -> tuple[np.ndarray, np.ndarray]:
+    """Return both ends of flat mirrors given in `FlatMirror` attribute form"""
+    half = unit_vectors(rotation) * (np.asarray(scale, dtype=float)[..., None] / 2)
+    location = np.asarray(location, dtype=float)
+    return location - half, location + half
+
+
+def spherical_geometry(
+    location, rotation, chord, focal
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return center, radius and reach of spherical mirrors given in `SphericalMirror` attribute form.
+
+    A negative focal length puts the center in front of the vertex instead of behind it.
+    """
+    radius = 2 * np.asarray(focal, dtype=float)
+    half_chord = np.asarray(chord, dtype=float) / 2
+    center = np.asarray(location, dtype=float) - radius[..., None] * unit_vectors(
+        rotation
+    )
+    sagitta = np.abs(radius) - np.sqrt(radius**2 - half_chord**2)
+    reach = np.sqrt(half_chord**2 + sagitta**2)
+    return center, radius, reach
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def _dot(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[..., 0] * b[..., 0] + a[..., 1] * b[..., 1]
+
+
+def intersect_segments(origins, directions, start, end) -> np.ndarray:
+    """
+    Distance along every ray to every segment.
+
+    Parameters
+    ----------
+    origins, directions : ndarray
+        Arrays of shape (..., R, 2), directions have to be unit vectors.
+    start, end : ndarray
+        Arrays of shape (..., N, 2)
+
+    Returns
+    -------
+    ndarray
+        Array of shape (..., R, N), `inf` where the ray misses the segment.
+    """
+    o = origins[..., :, None, :]
+    d = directions[..., :, None, :]
+    a = start[..., None, :, :]
+    e = (end - start)[..., None, :, :]
+    w = a - o
+
+    denom = _cross(d, e)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = _cross(w, e) / denom
+        s = _cross(w, d) / denom
+
+    hit = (denom != 0) & (t > EPSILON) & (s >= 0) & (s <= 1)
+    return np.where(hit, t, np.inf)
+
+
+def intersect_spheres(origins, directions, center, radius, vertex, reach) -> np.ndarray:
+    """
+    Distance along every ray to every spherical mirror.
+
+    Same as `intersect_segments`, but the optics are arcs described by
+    `spherical_geometry` and the location of their vertex.
+    """
+    o = origins[..., :, None, :]
+    d = directions[..., :, None, :]
+    oc = o - center[..., None, :, :]
+
+    b = _dot(d, oc)
+    c = _dot(oc, oc) - radius[..., None, :] ** 2
+    disc = b**2 - c
+    root = np.sqrt(np.maximum(disc, 0))
+
+    vertex = vertex[..., None, :, :]
+    reach = reach[..., None, :]
+
+    t = np.full(disc.shape, np.inf)
+    # check the far root first so that the near one takes precedence
+    for candidate in (-b + root, -b - root):
+        point = o + candidate[..., None] * d
+        valid = (
+            (disc >= 0)
+            & (candidate > EPSILON)
+            & (np.linalg.norm(point - vertex, axis=-1) <= reach)
+        )
+        t = np.where(valid, candidate, t)
+    return t
+
+
+def _slabs(origins, directions, bounds) -> tuple[np.ndarray, np.ndarray]:
+    """Parameters at which every ray enters and leaves every box"""
+    o = origins[..., :, None, :]
+    d = directions[..., :, None, :]
+    low = bounds[..., None, :, :2]
+    high = bounds[..., None, :, 2:]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t1 = (low - o) / d
+        t2 = (high - o) / d
+
+    # rays parallel to an axis either always or never are within the slab
+    inside = (low <= o) & (o <= high)
+    parallel = d == 0
+    near = np.where(parallel, np.where(inside, -np.inf, np.inf), np.minimum(t1, t2))
+    far = np.where(parallel, np.where(inside, np.inf, -np.inf), np.maximum(t1, t2))
+
+    return near.max(axis=-1), far.min(axis=-1)
+
+
+def ray_box_overlap(origins, directions, bounds) -> np.ndarray:
+    """
+    Check which axis aligned boxes lie (at least partially) in front of which rays.
+
+    Parameters
+    ----------
+    origins, directions : ndarray
+        Arrays of shape (..., R, 2)
+    bounds : ndarray
+        Array of shape (..., N, 4) holding min x, min y, max x, max y of every box
+
+    Returns
+    -------
+    ndarray
+        Boolean array of shape (..., R, N)
+    """
+    enter, leave = _slabs(origins, directions, bounds)
+    return leave >= np.maximum(enter, 0)
+
+
+def segment_box_overlap(start, end, bounds) -> np.ndarray:
+    """Same as `ray_box_overlap`, but for segments of shape (..., R, 2) between `start` and `end`"""
+    enter, leave = _slabs(start, end - start, bounds)
+    return (leave >= np.maximum(enter, 0)) & (enter <= 1)
+
+
+def segment_blocks(start, end, size: int = BLOCK_SIZE) -> np.ndarray:
+    """
+    Bounds of every run of `size` consecutive segments.
+
+    Parameters
+    ----------
+    start, end : ndarray
+        Arrays of shape (..., N, 2)
+
+    Returns
+    -------
+    ndarray
+        Array of shape (..., ceil(N / size), 4), the last run is padded with the last segment.
+    """
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    count = start.shape[-2]
+    padded = -(-count // size) * size
+    idx = np.minimum(np.arange(padded), max(count - 1, 0)).reshape(-1, size)
+    low = np.minimum(start[..., idx, :], end[..., idx, :]).min(axis=-2)
+    high = np.maximum(start[..., idx, :], end[..., idx, :]).max(axis=-2)
+    return np.concatenate((low, high), axis=-1)
+
+
+def reflect(directions: np.ndarray, normals: np.ndarray) -> np.ndarray:
+    """Reflect unit direction vectors off surfaces with the given unit normals"""
+    return directions - 2 * _dot(directions, normals)[..., None] * normals
+
+
+def refract(directions: np.ndarray, normals: np.ndarray, index) -> np.ndarray:
+    """
+    Refract unit direction vectors at the surface of a glass with the given refractive index.
+
+    `normals` have to point out of the glass, rays travelling along them leave it.
+    Rays which cannot leave the glass are totally internally reflected.
+    """
+    index = np.asarray(index, dtype=float)
+    cos_normal = _dot(directions, normals)
+    leaving = cos_normal > 0
+
+    eta = np.where(leaving, index, 1 / index)
+    facing = np.where(leaving[..., None], -normals, normals)
+    cos_in = np.abs(cos_normal)
+    k = 1 - eta**2 * (1 - cos_in**2)
+
+    refracted = (
+        eta[..., None] * directions
+        + (eta * cos_in - np.sqrt(np.maximum(k, 0)))[..., None] * facing
+    )
+    return np.where((k < 0)[..., None], reflect(directions, normals), refracted)
+
+
+def thin_lens(directions, axes, tangents, heights, power) -> np.ndarray:
+    """
+    Bend unit direction vectors passing through ideal thin lenses.
+
+    Parameters
+    ----------
+    directions : ndarray
+        Array of shape (..., 2)
+    axes, tangents : ndarray
+        Unit vectors of shape (..., 2) along the optical axis and along the lens
+    heights : ndarray
+        Signed distances of the hit points from the middle of the lenses, along `tangents`
+    power : ndarray
+        1 / focal length, positive for converging lenses
+    """
+    along = _dot(directions, axes)
+    # slope of the ray relative to the axis, measured in the direction of travel
+    slope = _dot(directions, tangents) / np.abs(along) - np.asarray(heights) * power
+    bent = np.sign(along)[..., None] * axes + slope[..., None] * tangents
+    return bent / np.linalg.norm(bent, axis=-1, keepdims=True)
+
+
+def _gather(values: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """Pick `values[..., idx, :]` for every ray"""
+    return np.take_along_axis(values, idx[..., None], axis=-2)
+
+
+def _per_row(values: np.ndarray, batch: tuple[int, ...]) -> np.ndarray:
+    """Turn a (..., N) array into a (*batch, N, 1) one, ready for `_gather`"""
+    return np.broadcast_to(values[..., None], batch + values.shape[-1:] + (1,))
+
+
+def _nearest(distances: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Distance to and index of the nearest optic of every ray, from (..., R, N) distances"""
+    if distances.shape[-1] == 0:
+        return np.full(distances.shape[:-1], np.inf), np.zeros(distances.shape[:-1], dtype=int)
+    nearest = np.argmin(distances, axis=-1)
+    return np.take_along_axis(distances, nearest[..., None], axis=-1)[..., 0], nearest
+
+
+def _block_pairs(origins: np.ndarray, directions: np.ndarray, blocks: np.ndarray) -> tuple:
+    """
+    Indices (*batch, ray, block) of every block lying in front of every ray.
+
+    Many blocks are first merged into groups of `BLOCK_SIZE`, and only the blocks of
+    the groups in front of a ray are tested, recursively.
+    """
+    count = blocks.shape[-2]
+    if count <= BLOCK_SIZE:
+        return np.nonzero(ray_box_overlap(origins, directions, blocks))
+
+    padded = -(-count // BLOCK_SIZE) * BLOCK_SIZE
+    idx = np.minimum(np.arange(padded), count - 1).reshape(-1, BLOCK_SIZE)
+    groups = np.concatenate(
+        (blocks[..., idx, :2].min(axis=-2), blocks[..., idx, 2:].max(axis=-2)), axis=-1
+    )
+    *lead, ray, group = _block_pairs(origins, directions, groups)
+
+    block = group[:, None] * BLOCK_SIZE + np.arange(BLOCK_SIZE)
+    valid = block < count
+    block = np.minimum(block, count - 1)
+    overlap = ray_box_overlap(
+        origins[(*lead, ray)][:, None],
+        directions[(*lead, ray)][:, None],
+        blocks[(*(l[:, None] for l in lead), block)],
+    )[:, 0]
+    pair, member = np.nonzero(overlap & valid)
+    return (*(l[pair] for l in lead), ray[pair], block[pair, member])
+
+
+def _nearest_in_blocks(
+    origins: np.ndarray, directions: np.ndarray, start, end, blocks
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Same as `_nearest` of `intersect_segments`, testing only the segments of blocks in front of the rays.
+
+    All arrays have to share the same batch dimensions.
+    """
+    count = start.shape[-2]
+    *lead, ray, block = _block_pairs(origins, directions, blocks)
+
+    distance = np.full(origins.shape[:-1], np.inf)
+    index = np.zeros(origins.shape[:-1], dtype=int)
+    if not ray.size:
+        return distance, index
+
+    # every (ray, block) pair tests all segments of its block
+    rows = block[:, None] * BLOCK_SIZE + np.arange(BLOCK_SIZE)
+    valid = rows < count
+    rows = np.minimum(rows, count - 1)
+    seg_lead = tuple(l[:, None] for l in lead)
+    t = intersect_segments(
+        origins[(*lead, ray)][:, None],
+        directions[(*lead, ray)][:, None],
+        start[(*seg_lead, rows)],
+        end[(*seg_lead, rows)],
+    )[:, 0]
+    t = np.where(valid, t, np.inf)
+    best = np.argmin(t, axis=-1)
+    t = t[np.arange(len(best)), best]
+    rows = rows[np.arange(len(best)), best]
+
+    # keep the nearest pair of every ray, the lowest row on ties like `np.argmin`
+    flat_ray = np.ravel_multi_index((*lead, ray), origins.shape[:-1])
+    order = np.lexsort((rows, t, flat_ray))
+    first = order[np.r_[True, flat_ray[order][1:] != flat_ray[order][:-1]]]
+    distance.reshape(-1)[flat_ray[first]] = t[first]
+    index.reshape(-1)[flat_ray[first]] = rows[first]
+    return distance, index
+
+
+def trace(geometry: Geometry, origins, directions, steps: int) -> TraceResult:
+    """
+    Trace all rays through the geometry for at most `steps` bounces.
+
+    A ray that does not hit anything travels `BIG_NUMBER` further and stops,
+    the same way `OpticSystem.step` handles it. Rows marked as lenses by
+    `Geometry.flat_power` and `Geometry.sphere_index` refract rays instead of
+    reflecting them. With `Geometry.flat_blocks`, rays are only tested against
+    the flat rows of the blocks they pass through.
+    """
+    origins = np.asarray(origins, dtype=float)
+    directions = np.asarray(directions, dtype=float)
+
+    batch = np.broadcast_shapes(
+        origins.shape[:-2], geometry.flat_start.shape[:-2], geometry.sphere_center.shape[:-2]
+    )
+    origins = np.broadcast_to(origins, batch + origins.shape[-2:]).copy()
+    directions = np.broadcast_to(directions, origins.shape).copy()
+
+    flat_count = geometry.flat_start.shape[-2]
+    flat_dir = geometry.flat_end - geometry.flat_start
+    flat_normals = np.stack((-flat_dir[..., 1], flat_dir[..., 0]), axis=-1)
+    flat_normals = flat_normals / np.linalg.norm(flat_normals, axis=-1, keepdims=True)
+    flat_normals = np.broadcast_to(flat_normals, batch + flat_normals.shape[-2:])
+    sphere_center = np.broadcast_to(
+        geometry.sphere_center, batch + geometry.sphere_center.shape[-2:]
+    )
+    sphere_count = sphere_center.shape[-2]
+
+    blocks = geometry.flat_blocks
+    if blocks is not None and flat_count and blocks.shape[-2] > 1:
+        flat_start = np.broadcast_to(geometry.flat_start, flat_normals.shape)
+        flat_end = np.broadcast_to(geometry.flat_end, flat_normals.shape)
+        blocks = np.broadcast_to(blocks, batch + blocks.shape[-2:])
+    else:
+        blocks = None
+
+    points = np.empty(origins.shape[:-1] + (steps + 1, 2))
+    points[..., 0, :] = origins
+    bounces = np.zeros(origins.shape[:-1], dtype=int)
+    alive = np.ones(origins.shape[:-1], dtype=bool)
+
+    for i in range(steps):
+        if blocks is not None:
+            flat_distance, flat_nearest = _nearest_in_blocks(
+                origins, directions, flat_start, flat_end, blocks
+            )
+        else:
+            flat_distance, flat_nearest = _nearest(
+                intersect_segments(
+                    origins, directions, geometry.flat_start, geometry.flat_end
+                )
+            )
+        sphere_distance, sphere_nearest = _nearest(
+            intersect_spheres(
+                origins,
+                directions,
+                geometry.sphere_center,
+                geometry.sphere_radius,
+                geometry.sphere_vertex,
+                geometry.sphere_reach,
+            )
+        )
+        # flat rows come first, and win ties
+        closer = flat_distance <= sphere_distance
+        distance = np.where(closer, flat_distance, sphere_distance)
+        nearest = np.where(closer, flat_nearest, flat_count + sphere_nearest)
+
+        hit = alive & np.isfinite(distance)
+        escaped = alive & ~hit
+
+        hit_points = origins + np.where(hit, distance, 0)[..., None] * directions
+
+        is_flat = nearest < flat_count
+        normals = np.zeros_like(directions)
+        if flat_count:
+            flat_idx = np.minimum(nearest, flat_count - 1)
+            normals = _gather(flat_normals, flat_idx)
+            start, seg = (
+                _gather(np.broadcast_to(values, flat_normals.shape), flat_idx)
+                for values in (geometry.flat_start, flat_dir)
+            )
+            along = (_dot(hit_points - start, seg) / _dot(seg, seg))[..., None]
+        if flat_count and geometry.flat_vertex_normals is not None:
+            # interpolate between the normals at both ends of the segment
+            first, last = (
+                _gather(np.broadcast_to(values, flat_normals.shape), flat_idx)
+                for values in (
+                    geometry.flat_vertex_normals[..., 0, :],
+                    geometry.flat_vertex_normals[..., 1, :],
+                )
+            )
+            smooth = (1 - along) * first + along * last
+            normals = smooth / np.linalg.norm(smooth, axis=-1, keepdims=True)
+        if sphere_count:
+            sphere_idx = np.clip(nearest - flat_count, 0, sphere_count - 1)
+            radial = hit_points - _gather(sphere_center, sphere_idx)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                radial = radial / np.linalg.norm(radial, axis=-1, keepdims=True)
+            normals = np.where(is_flat[..., None], normals, radial)
+
+        new_directions = reflect(directions, normals)
+        if flat_count and geometry.flat_power is not None:
+            power = _gather(_per_row(geometry.flat_power, batch), flat_idx)[..., 0]
+            lens = hit & is_flat & np.isfinite(power)
+            if lens.any():
+                length = np.linalg.norm(seg, axis=-1, keepdims=True)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    bent = thin_lens(
+                        directions,
+                        normals,
+                        seg / length,
+                        (along - 0.5)[..., 0] * length[..., 0],
+                        power,
+                    )
+                new_directions = np.where(lens[..., None], bent, new_directions)
+        if sphere_count and geometry.sphere_index is not None:
+            index = _gather(_per_row(geometry.sphere_index, batch), sphere_idx)[..., 0]
+            lens = hit & ~is_flat & np.isfinite(index)
+            if lens.any():
+                # turn the radial normals so that they point out of the glass
+                sign = _gather(_per_row(np.sign(geometry.sphere_radius), batch), sphere_idx)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    bent = refract(directions, radial * sign, index)
+                new_directions = np.where(lens[..., None], bent, new_directions)
+
+        origins = np.where(
+            hit[..., None],
+            hit_points,
+            np.where(escaped[..., None], origins + BIG_NUMBER * directions, origins),
+        )
+        directions = np.where(hit[..., None], new_directions, directions)
+        bounces += hit
+        alive = hit
+
+        points[..., i + 1, :] = origins
+        if not alive.any():
+            points[..., i + 2 :, :] = origins[..., None, :]
+            break
+
+    return TraceResult(points, bounces)
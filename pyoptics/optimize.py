@@ -0,0 +1,447 @@
+"""Batched design optimization of optic and emitter parameters"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor
+from math import exp, inf, log, sqrt
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from .optics2d import (
+    PI,
+    PI_HALF,
+    FlatMirror,
+    Lens,
+    Optic,
+    OpticSystem,
+    PolylineMirror,
+    RayEmitter,
+    SphericalMirror,
+)
+from .optics2d.kernels import (
+    BIG_NUMBER,
+    Geometry,
+    TraceResult,
+    flat_endpoints,
+    segment_blocks,
+    spherical_geometry,
+    trace,
+    unit_vectors,
+)
+
+
+__all__ = [
+    "Parameter",
+    "DesignProblem",
+    "OptimizeResult",
+    "TargetDistance",
+    "spot_rms",
+    "cma_es",
+]
+
+
+Objective = Callable[[TraceResult], np.ndarray]
+
+# cost of a ray which does not hit any optic, as if it ended this far from where it should
+MISS_PENALTY = BIG_NUMBER
+
+# tunable attributes of every kind of object
+_ATTRIBUTES: dict[type, tuple[str, ...]] = {
+    FlatMirror: ("location", "rotation", "scale"),
+    SphericalMirror: ("location", "rotation", "scale", "focal"),
+    PolylineMirror: ("location", "rotation", "scale"),
+    Lens: ("location", "rotation", "scale", "focal1", "focal2", "index", "thickness"),
+    RayEmitter: ("location", "rotation"),
+}
+
+# everything a polyline mirror is compiled from
+_POLYLINE_STATE = ("location", "rotation", "scale", "vertices", "smooth")
+
+
+def _kind(obj) -> type | None:
+    for cls in _ATTRIBUTES:
+        if isinstance(obj, cls):
+            return cls
+    return None
+
+
+def _detach(optic: PolylineMirror) -> PolylineMirror:
+    """A standalone copy of a polyline mirror, which can be changed without touching its system"""
+    copy = PolylineMirror.__new__(PolylineMirror)
+    Optic.__init__(copy)
+    for attr in _POLYLINE_STATE:
+        setattr(copy, attr, getattr(optic, attr))
+    return copy
+
+
+def _candidate_rows(kind: type, state: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Geometry rows of a flat mirror, spherical mirror or lens for every candidate.
+
+    `state` holds every attribute of `_ATTRIBUTES[kind]` with a leading population
+    dimension, the rows are computed like the optic's own `_compile`.
+    """
+    location, rotation, scale = state["location"], state["rotation"], state["scale"]
+    if kind is FlatMirror:
+        start, end = flat_endpoints(location, rotation, scale)
+        return {
+            "flat_start": start[:, None],
+            "flat_end": end[:, None],
+            "flat_vertex_normals": unit_vectors(rotation + PI_HALF)[:, None, None],
+        }
+    if kind is SphericalMirror:
+        center, radius, reach = spherical_geometry(
+            location, rotation, scale, state["focal"]
+        )
+        return {
+            "sphere_center": center[:, None],
+            "sphere_radius": radius[:, None],
+            "sphere_vertex": location[:, None],
+            "sphere_reach": reach[:, None],
+        }
+
+    index, focal1, focal2 = state["index"], state["focal1"], state["focal2"]
+    if not state["thickness"].any():
+        start, end = flat_endpoints(location, rotation + PI_HALF, scale)
+        return {
+            "flat_start": start[:, None],
+            "flat_end": end[:, None],
+            "flat_vertex_normals": unit_vectors(rotation)[:, None, None],
+            "flat_power": ((index - 1) * (1 / (2 * focal1) + 1 / (2 * focal2)))[:, None],
+        }
+
+    # the back surface is the front surface of the lens turned around
+    half = unit_vectors(rotation) * (state["thickness"][:, None] / 2)
+    vertex = np.stack((location + half, location - half), axis=1)
+    center, radius, reach = spherical_geometry(
+        vertex,
+        np.stack((rotation, rotation + PI), axis=1),
+        scale[:, None],
+        np.stack((focal1, focal2), axis=1),
+    )
+    return {
+        "sphere_center": center,
+        "sphere_radius": radius,
+        "sphere_vertex": vertex,
+        "sphere_reach": reach,
+        "sphere_index": np.stack((index, index), axis=1),
+    }
+
+
+class Parameter:
+    """A tunable attribute of an optic or an emitter, optionally bounded"""
+
+    def __init__(self, obj, attribute: str, lower=-inf, upper=inf) -> None:
+        kind = _kind(obj)
+        if kind is None:
+            raise TypeError(f"Cannot optimize objects of type {type(obj).__name__}")
+        if attribute not in _ATTRIBUTES[kind]:
+            raise ValueError(
+                f"{type(obj).__name__} has no tunable attribute {attribute!r}"
+            )
+        # a lens turning thin (or thick) would change the layout of the scene
+        if attribute == "thickness" and (obj.thickness <= 0 or lower <= 0):
+            raise ValueError(
+                "Only the thickness of a thick Lens can be optimized, "
+                "with a positive lower bound"
+            )
+
+        self.obj = obj
+        self.attribute = attribute
+        self.lower = lower
+        self.upper = upper
+
+    @property
+    def size(self) -> int:
+        """Number of scalar values this parameter contributes to a candidate vector"""
+        return 2 if self.attribute == "location" else 1
+
+
+class OptimizeResult(NamedTuple):
+    x: np.ndarray
+    cost: float
+    evaluations: int
+    generations: int
+
+
+def _hit_endpoints(result: TraceResult) -> np.ndarray:
+    """Location of the last bounce of every ray, NaN for rays which never hit an optic"""
+    return np.where(
+        (result.bounces > 0)[..., None], result.endpoints(), np.nan
+    )
+
+
+def spot_rms(result: TraceResult) -> np.ndarray:
+    """
+    RMS distance of the rays' last bounce locations from their centroid.
+
+    Every ray which does not hit any optic adds `MISS_PENALTY` divided by the number of rays.
+    """
+    ends = _hit_endpoints(result)
+    hit = ~np.isnan(ends[..., 0])
+    count = np.maximum(hit.sum(axis=-1), 1)
+
+    with np.errstate(invalid="ignore"):
+        centroid = np.nansum(ends, axis=-2, keepdims=True) / count[..., None, None]
+        spread = np.nansum(((ends - centroid) ** 2).sum(axis=-1), axis=-1)
+    missed = 1 - hit.mean(axis=-1)
+    return np.sqrt(spread / count) + MISS_PENALTY * missed
+
+
+class TargetDistance:
+    """
+    Mean distance of the rays' last bounce locations from a target point.
+
+    A ray which does not hit any optic counts as `MISS_PENALTY` away.
+    """
+
+    def __init__(self, target) -> None:
+        self.target = np.asarray(target, dtype=float)
+
+    def __call__(self, result: TraceResult) -> np.ndarray:
+        distance = np.linalg.norm(_hit_endpoints(result) - self.target, axis=-1)
+        return np.where(np.isnan(distance), MISS_PENALTY, distance).mean(axis=-1)
+
+
+def _position(objects, obj) -> int | None:
+    return next((i for i, o in enumerate(objects) if o == obj), None)
+
+
+class DesignProblem:
+    """
+    Evaluates whole populations of candidate parameter vectors with a single batched trace.
+
+    The geometry of every candidate is the compiled scene of the system (see
+    `OpticSystem.compile`), with the rows of the tuned optics recomputed for the
+    whole population at once. Only tuned polyline mirrors are recompiled candidate
+    by candidate. The system is captured when the problem is created, later changes
+    to it are not picked up.
+    """
+
+    def __init__(
+        self,
+        system: OpticSystem,
+        parameters: list[Parameter],
+        objective: Objective,
+        steps: int = 20,
+    ) -> None:
+        if not parameters:
+            raise ValueError("A DesignProblem needs at least one parameter")
+
+        self.parameters = parameters
+        self.objective = objective
+        self.steps = steps
+
+        scene = system.compile()
+        self._geometry = scene.geometry
+        flat_rows = len(scene.geometry.flat_start)
+        self._origins = np.array(
+            [r.location for r in system.rays], dtype=float
+        ).reshape(-1, 2)
+        self._rotations = np.array([r.rotation for r in system.rays], dtype=float)
+
+        # where every parameter goes: an optic (by its index in the compiled scene)
+        # or an emitter (by its index in `system.rays`)
+        self._targets: list[tuple[bool, int]] = []
+        # tuned optics by their index in the compiled scene: the state they are
+        # compiled from (a detached copy for polyline mirrors) and their rows
+        self._optics: dict[int, tuple[type, dict[str, np.ndarray] | Optic, slice]] = {}
+        for param in parameters:
+            is_ray = isinstance(param.obj, RayEmitter)
+            index = _position(system.rays if is_ray else scene.optics, param.obj)
+            if index is None:
+                raise ValueError(
+                    f"The {type(param.obj).__name__} of parameter {param.attribute!r} "
+                    "is not part of the system"
+                )
+            self._targets.append((is_ray, index))
+            if not is_ray and index not in self._optics:
+                kind = _kind(param.obj)
+                start, stop = scene.offsets[index], scene.offsets[index + 1]
+                if kind is PolylineMirror:
+                    state = _detach(param.obj)
+                else:
+                    state = {
+                        attr: np.asarray(getattr(param.obj, attr), dtype=float)
+                        for attr in _ATTRIBUTES[kind]  # type: ignore
+                    }
+                # sphere rows are counted after all flat rows
+                if start >= flat_rows:
+                    start, stop = start - flat_rows, stop - flat_rows
+                self._optics[index] = (kind, state, slice(start, stop))  # type: ignore
+
+        self.lower = np.array([p.lower for p in parameters for _ in range(p.size)])
+        self.upper = np.array([p.upper for p in parameters for _ in range(p.size)])
+
+    @property
+    def dimension(self) -> int:
+        """Length of a candidate parameter vector"""
+        return sum(p.size for p in self.parameters)
+
+    def x0(self) -> np.ndarray:
+        """The parameter vector describing the current state of the system"""
+        return np.array(
+            [v for p in self.parameters for v in np.ravel(getattr(p.obj, p.attribute))],
+            dtype=float,
+        )
+
+    def apply(self, x) -> None:
+        """Write a parameter vector back into the optics and emitters"""
+        offset = 0
+        for param in self.parameters:
+            value = np.asarray(x[offset : offset + param.size], dtype=float)
+            setattr(param.obj, param.attribute, value if param.size == 2 else float(value[0]))
+            offset += param.size
+
+    def trace(self, population) -> TraceResult:
+        """Trace every candidate of a (P, dimension) population at once"""
+        population = np.atleast_2d(np.asarray(population, dtype=float))
+        size = population.shape[0]
+
+        arrays = {
+            name: np.broadcast_to(values, (size,) + values.shape).copy()
+            for name, values in self._geometry._asdict().items()
+        }
+        origins = np.broadcast_to(self._origins, (size,) + self._origins.shape).copy()
+        rotations = np.broadcast_to(self._rotations, (size,) + self._rotations.shape).copy()
+
+        # tuned values of every optic, for the whole population
+        tuned: dict[int, dict[str, np.ndarray]] = {index: {} for index in self._optics}
+        offset = 0
+        for param, (is_ray, index) in zip(self.parameters, self._targets):
+            column = population[:, offset : offset + param.size]
+            value = column if param.size == 2 else column[:, 0]
+            offset += param.size
+            if not is_ray:
+                tuned[index][param.attribute] = value
+            elif param.attribute == "location":
+                origins[:, index] = value
+            else:
+                rotations[:, index] = value
+
+        for index, (kind, state, rows) in self._optics.items():
+            if kind is not PolylineMirror:
+                full = {
+                    attr: np.broadcast_to(value, (size,) + value.shape)
+                    for attr, value in state.items()  # type: ignore
+                }
+                for name, values in _candidate_rows(kind, full | tuned[index]).items():
+                    arrays[name][:, rows] = values
+                continue
+
+            # polyline mirrors have no batched form, compile them one by one
+            for candidate in range(size):
+                for attr, value in tuned[index].items():
+                    setattr(state, attr, value[candidate])
+                geometry = state.compiled  # type: ignore
+                arrays["flat_start"][candidate, rows] = geometry.start
+                arrays["flat_end"][candidate, rows] = geometry.end
+                arrays["flat_vertex_normals"][candidate, rows] = geometry.vertex_normals
+
+        # the tuned rows may have moved out of the blocks of the compiled scene
+        arrays["flat_blocks"] = segment_blocks(arrays["flat_start"], arrays["flat_end"])
+        return trace(Geometry(**arrays), origins, unit_vectors(rotations), self.steps)
+
+    def _evaluate(self, population: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore"):
+            cost = np.asarray(self.objective(self.trace(population)), dtype=float)
+        return np.where(np.isnan(cost), inf, cost)
+
+    def evaluate(
+        self, population, executor: Executor | None = None, chunks: int = 1
+    ) -> np.ndarray:
+        """
+        Return the cost of every candidate in the population.
+
+        If an executor is given, the population is split into `chunks` parts evaluated in parallel.
+        """
+        population = np.atleast_2d(np.asarray(population, dtype=float))
+        if executor is None or chunks <= 1 or len(population) < 2 * chunks:
+            return self._evaluate(population)
+
+        parts = np.array_split(population, chunks)
+        return np.concatenate(list(executor.map(self._evaluate, parts)))
+
+
+def cma_es(
+    problem: DesignProblem,
+    sigma: float = 0.5,
+    population: int | None = None,
+    generations: int = 200,
+    tol: float = 1e-9,
+    seed: int | None = None,
+    workers: int | None = None,
+) -> OptimizeResult:
+    """
+    Minimize the problem's objective with CMA-ES, starting from the current state of the system.
+
+    Every generation is evaluated as a single batch. `workers` > 1 additionally
+    spreads each generation over a process pool, which pays off for large populations.
+    """
+    rng = np.random.default_rng(seed)
+    n = problem.dimension
+    lam = population or 4 + int(3 * log(n))
+    mu = lam // 2
+
+    weights = log(mu + 0.5) - np.log(np.arange(1, mu + 1))
+    weights /= weights.sum()
+    mueff = 1 / (weights**2).sum()
+
+    cc = (4 + mueff / n) / (n + 4 + 2 * mueff / n)
+    cs = (mueff + 2) / (n + mueff + 5)
+    c1 = 2 / ((n + 1.3) ** 2 + mueff)
+    cmu = min(1 - c1, 2 * (mueff - 2 + 1 / mueff) / ((n + 2) ** 2 + mueff))
+    damps = 1 + 2 * max(0, sqrt((mueff - 1) / (n + 1)) - 1) + cs
+    chi_n = sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n**2))
+
+    mean = np.clip(problem.x0(), problem.lower, problem.upper)
+    pc = np.zeros(n)
+    ps = np.zeros(n)
+    cov = np.eye(n)
+
+    best_x = mean
+    best_cost = float(problem.evaluate(mean)[0])
+    evaluations = 1
+
+    executor = ProcessPoolExecutor(workers) if workers and workers > 1 else None
+    try:
+        generation = 0
+        for generation in range(1, generations + 1):
+            eigenvalues, basis = np.linalg.eigh(cov)
+            scales = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+            steps = rng.standard_normal((lam, n)) @ (basis * scales).T
+            candidates = np.clip(mean + sigma * steps, problem.lower, problem.upper)
+
+            cost = problem.evaluate(candidates, executor, workers or 1)
+            evaluations += lam
+
+            order = np.argsort(cost)
+            if cost[order[0]] < best_cost:
+                best_cost = float(cost[order[0]])
+                best_x = candidates[order[0]]
+
+            selected = (candidates[order[:mu]] - mean) / sigma
+            step = weights @ selected
+            mean = mean + sigma * step
+
+            inv_sqrt = basis @ np.diag(1 / scales) @ basis.T
+            ps = (1 - cs) * ps + sqrt(cs * (2 - cs) * mueff) * (inv_sqrt @ step)
+            hsig = np.linalg.norm(ps) / sqrt(
+                1 - (1 - cs) ** (2 * generation)
+            ) / chi_n < 1.4 + 2 / (n + 1)
+            pc = (1 - cc) * pc + hsig * sqrt(cc * (2 - cc) * mueff) * step
+
+            cov = (
+                (1 - c1 - cmu) * cov
+                + c1 * (np.outer(pc, pc) + (1 - hsig) * cc * (2 - cc) * cov)
+                + cmu * (selected.T * weights) @ selected
+            )
+            sigma *= exp((cs / damps) * (np.linalg.norm(ps) / chi_n - 1))
+
+            if sigma * scales.max() < tol:
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return OptimizeResult(best_x, best_cost, evaluations, generation)
@@ -12,6 +12,7 @@ __all__ = [
     "RenderRay",
     "RenderFlat",
     "RenderSpherical",
+    "RenderPolyline",
     "RenderLens",
     "RenderScene",
 ]
@@ -29,6 +30,11 @@ PYGAME_MIDDLE_OFFSET = (300, 300)
 
 DEFAULT_LINE_WIDTH = 1
 
+# above this many visible rays, ray paths are drawn as a density raster
+LOD_RAYS = 2000
+# size (in pixels) of a density raster cell
+LOD_CELL = 3
+
 
 class Renderable(ABC):
     def __init__(self, obj, color=BLUE, width=DEFAULT_LINE_WIDTH) -> None:
@@ -47,6 +53,14 @@ class Renderable(ABC):
         """Return whether the mouse hovers over this object"""
         raise NotImplementedError
 
+    def is_visible(self, view: VecArg) -> bool:
+        """Return whether this object may overlap the given world space rectangle"""
+        try:
+            bounds = self.obj.compiled.bounds  # type: ignore
+        except NotImplementedError:
+            return True
+        return _boxes_overlap(bounds, view)
+
 
 class RenderRay(Renderable):
     def __init__(
@@ -57,18 +71,43 @@ class RenderRay(Renderable):
         self.ray_color = ray_color
         self.ray_width = ray_width
 
-    def render(self, scene: "RenderScene"):
-        loc = tuple(scene.to_scene_coords(self.obj.location))
-        points = [loc] + list(
-            map(
-                lambda x: tuple(scene.to_scene_coords(x)),
-                self.obj.bounce_locations + [self.obj.current_ray_location],
-            )
+    def path(self) -> VecArg:
+        """World space points of the path traveled by the ray, starting at the emitter"""
+        return np.array(
+            [self.obj.location]
+            + list(self.obj.bounce_locations)
+            + [self.obj.current_ray_location],
+            dtype=float,
         )
+
+    def render_emitter(self, scene: "RenderScene"):
+        loc = tuple(scene.to_scene_coords(self.obj.location))
         pygame.draw.circle(scene.scr, self.color, loc, scene.scale / 10)
-        if len(points) >= 2:
+
+    def render(self, scene: "RenderScene"):
+        self.render_emitter(scene)
+
+        path = self.path()
+        start, end = path[:-1], path[1:]
+        view = scene.view_bounds()
+        visible = np.flatnonzero(
+            (np.minimum(start, end) <= view[2:]).all(axis=-1)
+            & (np.maximum(start, end) >= view[:2]).all(axis=-1)
+        )
+
+        # draw every run of consecutive visible segments as one polyline
+        for run in np.split(visible, np.flatnonzero(np.diff(visible) > 1) + 1):
+            if not run.size:
+                continue
+            points = scene.to_scene_coords(path[run[0] : run[-1] + 2].T).T
             pygame.draw.lines(scene.scr, self.ray_color, False, points, self.ray_width)
 
+    def is_visible(self, view: VecArg) -> bool:
+        path = self.path()
+        return _boxes_overlap(
+            np.concatenate((path.min(axis=0), path.max(axis=0))), view
+        )
+
     def check_mouse_hover(
         self, scene: "RenderScene", mouse_pos: tuple[int, int]
     ) -> bool:
@@ -144,18 +183,90 @@ class RenderSpherical(Renderable):
     ) -> bool:
         return (
             dist(self.obj.location, scene.from_scene_coords(mouse_pos))
-            <= self.obj._max_distance  # pylint: disable=W0212 # I know what I'm doing, don't scream at me
+            <= self.obj.compiled.reach
+        )
+
+
+class RenderPolyline(Renderable):
+    def render(self, scene: "RenderScene"):
+        self.obj: PolylineMirror
+        points = scene.to_scene_coords(self.obj.compiled.vertices.T).T
+        pygame.draw.lines(scene.scr, self.color, False, points, width=self.linewidth)
+
+    def check_mouse_hover(
+        self, scene: "RenderScene", mouse_pos: tuple[int, int]
+    ) -> bool:
+        geometry = self.obj.compiled
+        mouse = scene.from_scene_coords(mouse_pos)
+
+        seg = geometry.end - geometry.start
+        along = np.clip(
+            np.einsum("ij,ij->i", mouse - geometry.start, seg)
+            / np.einsum("ij,ij->i", seg, seg),
+            0,
+            1,
         )
+        closest = geometry.start + along[:, None] * seg
+        return np.linalg.norm(closest - mouse, axis=-1).min() <= 0.1
 
 
 class RenderLens(Renderable):
-    NotImplemented
+    # number of points drawn along every surface of a thick lens
+    ARC_POINTS = 16
+
+    def outline(self) -> VecArg:
+        """World space points of the outline of the lens"""
+        self.obj: Lens
+        geometry = self.obj.compiled
+        if isinstance(geometry, ThinLensGeometry):
+            return np.array((geometry.start, geometry.end))
+
+        angles = np.linspace(geometry.arc[:, 0], geometry.arc[:, 1], self.ARC_POINTS)
+        surfaces = geometry.center[:, None] + np.abs(geometry.radius)[
+            :, None, None
+        ] * np.stack((np.cos(angles.T), np.sin(angles.T)), axis=-1)
+        front, back = surfaces
+        # continue with the end of the back surface closer to where the front one ended
+        if dist(front[-1], back[0]) > dist(front[-1], back[-1]):
+            back = back[::-1]
+        return np.concatenate((front, back))
 
-    def render(self, scene):
-        raise NotImplementedError
+    def render(self, scene: "RenderScene"):
+        points = scene.to_scene_coords(self.outline().T).T
+        if isinstance(self.obj.compiled, ThinLensGeometry):
+            pygame.draw.line(
+                scene.scr, self.color, points[0], points[1], width=self.linewidth
+            )
+            self.__render_tips(scene)
+        else:
+            pygame.draw.lines(scene.scr, self.color, True, points, width=self.linewidth)
+
+    def __render_tips(self, scene: "RenderScene"):
+        """Arrow tips at both ends of a thin lens, pointing out for converging lenses"""
+        geometry: ThinLensGeometry = self.obj.compiled
+        size = self.obj.scale / 10
+        along = (geometry.end - geometry.start) / self.obj.scale
+        if self.obj.power < 0:
+            along = -along
+
+        for tip, outward in ((geometry.end, along), (geometry.start, -along)):
+            for side in (-1, 1):
+                wing = tip - size * outward + side * size * geometry.axis
+                pygame.draw.line(
+                    scene.scr,
+                    self.color,
+                    tuple(scene.to_scene_coords(tip)),
+                    tuple(scene.to_scene_coords(wing)),
+                    width=self.linewidth,
+                )
 
-    def check_mouse_hover(self, scene, mouse_pos):
-        raise NotImplementedError
+    def check_mouse_hover(
+        self, scene: "RenderScene", mouse_pos: tuple[int, int]
+    ) -> bool:
+        return (
+            dist(self.obj.location, scene.from_scene_coords(mouse_pos))
+            <= self.obj.scale / 2
+        )
 
 
 class RenderScene:
@@ -166,12 +277,14 @@ class RenderScene:
         steps: int = STEPS,
         scale: float | int = PYGAME_SCALE,
         middle: tuple[int, int] = PYGAME_MIDDLE_OFFSET,
+        lod_rays: int = LOD_RAYS,
     ) -> None:
         self.system = system
         self.scr = scr
         self.steps = steps
         self.scale = scale
-        self.middle = middle
+        self.middle: tuple[float, float] = middle
+        self.lod_rays = lod_rays
 
         self.object_renderers: list[Renderable] = list(
             map(self._make_renderer, system.optics + system.rays)  # type: ignore #I know what im doing
@@ -180,18 +293,27 @@ class RenderScene:
     def reset(self) -> None:
         self.system.reset()
 
-    def add(self, obj: Optic | RayEmitter) -> None:
-        self.system.add(obj)
+    def add(self, obj: Optic | RayEmitter) -> Optic | RayEmitter:
+        """Add an object to the system and return the stored object, like `OpticSystem.add`"""
+        obj = self.system.add(obj)
         self.object_renderers.append(self._make_renderer(obj))
+        return obj
 
-    def run(self, steps: int | None = None) -> pygame.Surface:
+    def remove(self, obj: Optic | RayEmitter) -> None:
+        self.system.remove(obj)
+        # compares views of a `CompactOpticSystem` by the object they point to
+        self.object_renderers = [r for r in self.object_renderers if r.obj != obj]
+
+    def run(
+        self, steps: int | None = None, rays: list[RayEmitter] | None = None
+    ) -> pygame.Surface:
         if steps is None:
             steps = self.steps
 
         self.scr.fill(BACKGROUND_COLOR)
 
         for _ in range(steps):
-            if self.system.step():
+            if self.system.step(rays):
                 break
 
         self.render()
@@ -206,8 +328,83 @@ class RenderScene:
         return self.scr
 
     def render(self):
+        view = self.view_bounds()
+        rays: list[RenderRay] = []
         for j in self.object_renderers:
-            j.render(self)
+            if not j.is_visible(view):
+                continue
+            if isinstance(j, RenderRay):
+                rays.append(j)
+            else:
+                j.render(self)
+
+        if len(rays) <= self.lod_rays:
+            for ray in rays:
+                ray.render(self)
+            return
+
+        self._render_density(rays)
+        for ray in rays:
+            ray.render_emitter(self)
+
+    def redraw(self) -> pygame.Surface:
+        """Clear the screen and render the current state without stepping the simulation"""
+        self.scr.fill(BACKGROUND_COLOR)
+        self.render()
+        return self.scr
+
+    def _render_density(self, rays: "list[RenderRay]") -> None:
+        """Draw the paths of many rays as a raster of how many rays cross every cell"""
+        width, height = self.scr.get_size()
+        grid = np.zeros((width // LOD_CELL + 1, height // LOD_CELL + 1))
+
+        paths = [self.to_scene_coords(ray.path().T).T for ray in rays]
+        start = np.concatenate([path[:-1] for path in paths])
+        end = np.concatenate([path[1:] for path in paths])
+        start, end = _clip_segments(start, end, (0, 0, width - 1, height - 1))
+
+        # sample every segment roughly once per cell
+        counts = np.ceil(np.linalg.norm(end - start, axis=-1) / LOD_CELL).astype(int) + 1
+        segment = np.repeat(np.arange(len(start)), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        along = (np.arange(len(segment)) - first) / np.maximum(counts[segment] - 1, 1)
+        points = start[segment] + along[:, None] * (end - start)[segment]
+
+        cells = (points // LOD_CELL).astype(int)
+        np.add.at(grid, (cells[:, 0], cells[:, 1]), 1)
+
+        if not grid.any():
+            return
+        intensity = np.log1p(grid) / np.log1p(grid.max())
+        color = np.array(rays[0].ray_color[:3], dtype=float)
+        raster = pygame.surfarray.make_surface(
+            (intensity[..., None] * color).astype(np.uint8)
+        )
+        raster = pygame.transform.scale(
+            raster, (grid.shape[0] * LOD_CELL, grid.shape[1] * LOD_CELL)
+        )
+        self.scr.blit(raster, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+
+    def view_bounds(self) -> VecArg:
+        """World space rectangle visible on the screen: min x, min y, max x, max y"""
+        width, height = self.scr.get_size()
+        low = self.from_scene_coords((0, height))
+        high = self.from_scene_coords((width, 0))
+        return np.concatenate((low, high))
+
+    def pan(self, offset: tuple[float, float]) -> None:
+        """Move the view by the given offset in pixels"""
+        self.middle = (self.middle[0] + offset[0], self.middle[1] + offset[1])
+
+    def zoom(self, factor: float, anchor: tuple[float, float] | None = None) -> None:
+        """Scale the view, keeping the point under `anchor` (the middle by default) in place"""
+        if anchor is None:
+            anchor = self.middle
+        self.scale *= factor
+        self.middle = (
+            anchor[0] - (anchor[0] - self.middle[0]) * factor,
+            anchor[1] - (anchor[1] - self.middle[1]) * factor,
+        )
 
     def to_scene_coords(self, vec: VecArg) -> VecArg:
         return np.asarray(
@@ -240,7 +437,41 @@ class RenderScene:
                 return RenderFlat(obj)
             case SphericalMirror():
                 return RenderSpherical(obj)
+            case PolylineMirror():
+                return RenderPolyline(obj)
             case Lens():
                 return RenderLens(obj)
             case _:
                 raise TypeError
+
+
+def _boxes_overlap(box: VecArg, other: VecArg) -> bool:
+    return bool(
+        box[0] <= other[2]
+        and box[2] >= other[0]
+        and box[1] <= other[3]
+        and box[3] >= other[1]
+    )
+
+
+def _clip_segments(start: VecArg, end: VecArg, rect) -> tuple[VecArg, VecArg]:
+    """Clip segments to a rectangle (Liang-Barsky), dropping those outside of it"""
+    delta = end - start
+    p = np.stack((-delta[:, 0], delta[:, 0], -delta[:, 1], delta[:, 1]), axis=-1)
+    q = np.stack(
+        (
+            start[:, 0] - rect[0],
+            rect[2] - start[:, 0],
+            start[:, 1] - rect[1],
+            rect[3] - start[:, 1],
+        ),
+        axis=-1,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = q / p
+    enter = np.where(p < 0, ratio, 0).max(axis=-1)
+    leave = np.where(p > 0, ratio, 1).min(axis=-1)
+    keep = (enter <= leave) & ~((p == 0) & (q < 0)).any(axis=-1)
+
+    start, delta = start[keep], delta[keep]
+    return start + enter[keep, None] * delta, start + leave[keep, None] * delta
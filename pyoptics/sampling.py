@@ -0,0 +1,108 @@
+"""Adaptive sampling of ray fans, concentrating rays where their paths diverge"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from .optics2d import OpticSystem, RayEmitter
+from .optics2d.kernels import TraceResult, trace, unit_vectors
+
+
+__all__ = [
+    "AdaptiveFan",
+    "adaptive_fan",
+]
+
+
+class AdaptiveFan(NamedTuple):
+    """Rays of a fan traced by `adaptive_fan`, sorted by their angle"""
+
+    location: np.ndarray  # (2,)
+    angles: np.ndarray  # (R,)
+    endpoints: np.ndarray  # (R, 2) location of the last bounce of every ray
+    directions: np.ndarray  # (R, 2) direction every ray leaves its last bounce in
+    bounces: np.ndarray  # (R,)
+
+    def emitters(self) -> list[RayEmitter]:
+        """One emitter per ray of the fan"""
+        return [RayEmitter(self.location, float(angle)) for angle in self.angles]
+
+
+def _outcome(result: TraceResult) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Endpoints, final directions and bounce counts of traced rays"""
+    steps = result.points.shape[-2] - 1
+    # a ray that used up all steps has no segment after its last bounce
+    idx = np.clip(result.bounces + 1, 1, steps)[:, None, None]
+    after = np.take_along_axis(result.points, idx, axis=-2)[:, 0]
+    before = np.take_along_axis(result.points, idx - 1, axis=-2)[:, 0]
+
+    directions = after - before
+    length = np.linalg.norm(directions, axis=-1, keepdims=True)
+    directions = np.divide(
+        directions, length, out=np.zeros_like(directions), where=length > 0
+    )
+    return result.endpoints(), directions, result.bounces
+
+
+def adaptive_fan(
+    system: OpticSystem,
+    location,
+    start: float,
+    stop: float,
+    steps: int = 20,
+    initial: int = 16,
+    tolerance: float = 0.05,
+    angle_tolerance: float = 0.05,
+    max_rays: int = 2000,
+    min_width: float = 1e-6,
+) -> AdaptiveFan:
+    """
+    Trace a fan of rays between the angles `start` and `stop`, adding rays only where needed.
+
+    The fan starts with `initial` evenly spread rays. Every interval between two
+    neighbouring rays whose last bounce locations are further than `tolerance` apart,
+    whose final directions differ by more than about `angle_tolerance` radians or
+    which bounce a different number of times is split in half, and the new rays are
+    traced in a single batch. This repeats until no interval diverges, the intervals
+    get narrower than `min_width` or `max_rays` rays were traced, in which case the
+    most diverging intervals are split first.
+
+    The fan is adapted to `system` as it is now: its rays are plain emitters
+    afterwards, and are not resampled when the optics move.
+    """
+    location = np.asarray(location, dtype=float)
+    geometry = system.compile().geometry
+
+    def shoot(angles: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        origins = np.broadcast_to(location, angles.shape + (2,))
+        return _outcome(trace(geometry, origins, unit_vectors(angles), steps))
+
+    angles = np.linspace(start, stop, max(initial, 2))
+    endpoints, directions, bounces = shoot(angles)
+
+    while len(angles) < max_rays:
+        divergence = np.maximum(
+            np.linalg.norm(np.diff(endpoints, axis=0), axis=-1) / tolerance,
+            np.linalg.norm(np.diff(directions, axis=0), axis=-1) / angle_tolerance,
+        )
+        divergence[np.diff(bounces) != 0] = np.inf
+        divergence[np.diff(angles) < 2 * min_width] = 0
+
+        split = np.flatnonzero(divergence > 1)
+        if not split.size:
+            break
+        if len(angles) + split.size > max_rays:
+            order = np.argsort(divergence[split])[::-1]
+            split = np.sort(split[order[: max_rays - len(angles)]])
+
+        new_angles = (angles[split] + angles[split + 1]) / 2
+        new_endpoints, new_directions, new_bounces = shoot(new_angles)
+
+        # every new ray goes right after the left end of its interval
+        position = split + 1
+        angles = np.insert(angles, position, new_angles)
+        endpoints = np.insert(endpoints, position, new_endpoints, axis=0)
+        directions = np.insert(directions, position, new_directions, axis=0)
+        bounces = np.insert(bounces, position, new_bounces)
+
+    return AdaptiveFan(location, angles, endpoints, directions, bounces)
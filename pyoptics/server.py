@@ -0,0 +1,427 @@
+"""
+Long-running trace server keeping scenes loaded between requests, and its client.
+
+Messages in both directions are framed as a 4 byte big endian header length, a JSON
+header and the raw bytes of the NumPy arrays the header lists under `"arrays"`.
+Requests carry an `"op"` and an optional `"tag"`, which is copied into the response,
+so a single connection can have several requests in flight.
+
+Operations:
+
+- `load` -- `scene` id and either a `path` to a config file readable by the server,
+  or the `config` text itself
+- `update` -- set `attribute` of the object at `index` (optics first, then emitters,
+  like `export.Sweep`) of `scene` to `value`. Rotations are in radians and given like
+  to the constructors and in config files, also for flat mirrors
+- `trace` -- trace `scene` for `steps` bounces, either from its emitters or from
+  (origins, directions) arrays sent along. Responds with the points and bounces arrays
+- `drop` -- forget `scene`
+- `scenes` -- list the ids of loaded scenes
+
+Every scene is kept by one worker process, which is sent the compiled geometry of
+the scene only when it changed since the previous trace.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+import itertools
+import json
+import multiprocessing
+import os
+import struct
+from typing import Any
+
+import numpy as np
+
+from .config import parse_cfg, parse_cfg_lines
+from .optics2d import PI_HALF, CompiledScene, FlatMirror, OpticSystem
+from .optics2d.kernels import Geometry, TraceResult, trace, unit_vectors
+
+
+__all__ = [
+    "TraceServer",
+    "TraceClient",
+    "ServerError",
+]
+
+
+_LENGTH = struct.Struct("!I")
+
+# attributes a client may change with `update`
+UPDATABLE = frozenset(
+    (
+        "location",
+        "rotation",
+        "scale",
+        "focal",
+        "focal1",
+        "focal2",
+        "index",
+        "thickness",
+        "vertices",
+    )
+)
+
+
+class ServerError(Exception):
+    """Raised by `TraceClient` when the server could not process a request"""
+
+
+# geometry of the scenes kept by a worker process, with the token it was sent with
+_WORKER_SCENES: dict[str, tuple[int, Geometry]] = {}
+
+
+def _trace_scene(
+    scene: str, token: int, geometry: Geometry | None, origins, directions, steps: int
+) -> TraceResult | None:
+    """
+    Trace a scene kept by this worker, storing `geometry` under `token` first if given.
+
+    Returns None if the worker does not have the geometry of `token`.
+    """
+    if geometry is not None:
+        _WORKER_SCENES[scene] = (token, geometry)
+    kept = _WORKER_SCENES.get(scene)
+    if kept is None or kept[0] != token:
+        return None
+    return trace(kept[1], origins, directions, steps)
+
+
+def _forget_scene(scene: str) -> None:
+    _WORKER_SCENES.pop(scene, None)
+
+
+def _parse(request: dict[str, Any]) -> OpticSystem:
+    if "config" in request:
+        optics, rays = parse_cfg_lines(request["config"].splitlines())
+    else:
+        optics, rays = parse_cfg(request["path"])
+    system = OpticSystem(optics, rays)
+    system.compile()
+    return system
+
+
+def _encode(header: dict[str, Any], arrays=()) -> bytes:
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    header = dict(
+        header, arrays=[{"dtype": a.dtype.str, "shape": a.shape} for a in arrays]
+    )
+    data = json.dumps(header).encode()
+    return b"".join([_LENGTH.pack(len(data)), data] + [a.tobytes() for a in arrays])
+
+
+async def _read(
+    reader: asyncio.StreamReader,
+) -> tuple[dict[str, Any], list[np.ndarray]]:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    header = json.loads(await reader.readexactly(length))
+
+    arrays = []
+    for spec in header.pop("arrays", []):
+        dtype = np.dtype(spec["dtype"])
+        shape = tuple(spec["shape"])
+        size = dtype.itemsize * int(np.prod(shape, dtype=int))
+        data = await reader.readexactly(size)
+        arrays.append(np.frombuffer(data, dtype).reshape(shape))
+    return header, arrays
+
+
+class TraceServer:
+    """
+    Keeps `OpticSystem`s by id and traces them on request.
+
+    Requests are handled concurrently, config files are parsed in a thread and
+    traces in worker processes, so they do not block other requests. A trace works
+    on the compiled snapshot of the scene taken when the request arrives.
+
+    By default every scene is assigned to one of `workers` single process pools,
+    which keeps its geometry between traces and is sent a new one only after the
+    scene changed. With an `executor` given instead, the geometry is copied to it
+    with every trace.
+    """
+
+    def __init__(self, executor: Executor | None = None, workers: int | None = None):
+        self.scenes: dict[str, OpticSystem] = {}
+        self.executor = executor
+        self.workers: list[ProcessPoolExecutor] = []
+        if executor is None:
+            # forked workers would inherit (and keep open) the sockets of clients
+            context = multiprocessing.get_context("spawn")
+            self.workers = [
+                ProcessPoolExecutor(1, mp_context=context)
+                for _ in range(workers or os.cpu_count() or 1)
+            ]
+        self._next_worker = itertools.cycle(self.workers)
+        self._worker_of: dict[str, ProcessPoolExecutor] = {}
+        # snapshot last sent to the worker of a scene, and its token
+        self._sent: dict[str, tuple[CompiledScene, int]] = {}
+        self._tokens = itertools.count()
+
+    async def serve_unix(self, path: str) -> asyncio.AbstractServer:
+        """Start accepting clients on a Unix socket"""
+        return await asyncio.start_unix_server(self._handle_client, path)
+
+    async def serve_tcp(
+        self, host: str = "127.0.0.1", port: int = 0
+    ) -> asyncio.AbstractServer:
+        """Start accepting clients on a TCP port, pick a free one by default"""
+        return await asyncio.start_server(self._handle_client, host, port)
+
+    def close(self) -> None:
+        """Shut the worker processes down, if the server created them"""
+        for worker in self.workers:
+            worker.shutdown()
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        tasks = set()
+        try:
+            while True:
+                try:
+                    header, arrays = await _read(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                task = asyncio.create_task(self._respond(writer, header, arrays))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.wait(tasks)
+        finally:
+            writer.close()
+
+    async def _respond(
+        self, writer: asyncio.StreamWriter, header: dict[str, Any], arrays
+    ) -> None:
+        try:
+            response, result = await self.handle(header, arrays)
+            response = dict(response, ok=True)
+        except Exception as e:  # reported to the client, the server keeps running
+            response, result = {"ok": False, "error": f"{type(e).__name__}: {e}"}, ()
+        if "tag" in header:
+            response["tag"] = header["tag"]
+
+        writer.write(_encode(response, result))
+        await writer.drain()
+
+    async def handle(
+        self, request: dict[str, Any], arrays: list[np.ndarray]
+    ) -> tuple[dict[str, Any], list[np.ndarray]]:
+        """Process a single request, return the response header and arrays"""
+        match request.get("op"):
+            case "load":
+                system = await asyncio.get_running_loop().run_in_executor(
+                    None, _parse, request
+                )
+                scene = request["scene"]
+                self.scenes[scene] = system
+                self._sent.pop(scene, None)
+                if self.workers and scene not in self._worker_of:
+                    self._worker_of[scene] = next(self._next_worker)
+                return {"optics": len(system.optics), "rays": len(system.rays)}, []
+
+            case "update":
+                system = self.scenes[request["scene"]]
+                attribute = request["attribute"]
+                if attribute not in UPDATABLE:
+                    raise ValueError(f"Attribute {attribute!r} cannot be updated")
+                obj = (system.optics + system.rays)[request["index"]]  # type: ignore
+                if not hasattr(obj, attribute):
+                    raise ValueError(
+                        f"{type(obj).__name__} has no attribute {attribute!r}"
+                    )
+                value = request["value"]
+                if isinstance(value, list):
+                    value = np.asarray(value, dtype=float)
+                if attribute == "rotation" and isinstance(obj, FlatMirror):
+                    # the constructor stores the rotation of a flat mirror turned by 90 degrees
+                    value = value - PI_HALF
+                setattr(obj, attribute, value)
+                return {}, []
+
+            case "trace":
+                scene = request["scene"]
+                system = self.scenes[scene]
+                snapshot = system.compile()
+                if arrays:
+                    origins, directions = arrays
+                else:
+                    origins = np.array(
+                        [r.location for r in system.rays], dtype=float
+                    ).reshape(-1, 2)
+                    directions = unit_vectors(
+                        [r.rotation for r in system.rays]
+                    ).reshape(-1, 2)
+
+                steps = int(request.get("steps", 20))
+                result = await self._trace(scene, snapshot, origins, directions, steps)
+                return {}, [result.points, result.bounces]
+
+            case "drop":
+                scene = request["scene"]
+                del self.scenes[scene]
+                self._sent.pop(scene, None)
+                worker = self._worker_of.pop(scene, None)
+                if worker is not None:
+                    await asyncio.get_running_loop().run_in_executor(
+                        worker, _forget_scene, scene
+                    )
+                return {}, []
+
+            case "scenes":
+                return {"scenes": list(self.scenes)}, []
+
+            case op:
+                raise ValueError(f"Unknown operation {op!r}")
+
+    async def _trace(
+        self, scene: str, snapshot: CompiledScene, origins, directions, steps: int
+    ) -> TraceResult:
+        loop = asyncio.get_running_loop()
+        if not self.workers:
+            return await loop.run_in_executor(
+                self.executor, trace, snapshot.geometry, origins, directions, steps
+            )
+
+        worker = self._worker_of[scene]
+        sent = self._sent.get(scene)
+        if sent is not None and sent[0] is snapshot:
+            token, geometry = sent[1], None
+        else:
+            # the worker runs requests in order, later traces can rely on this one
+            token, geometry = next(self._tokens), snapshot.geometry
+            self._sent[scene] = (snapshot, token)
+
+        result = await loop.run_in_executor(
+            worker, _trace_scene, scene, token, geometry, origins, directions, steps
+        )
+        if result is None:
+            # the geometry did not reach the worker, send it along again
+            result = await loop.run_in_executor(
+                worker,
+                _trace_scene,
+                scene,
+                token,
+                snapshot.geometry,
+                origins,
+                directions,
+                steps,
+            )
+        return result
+
+
+class TraceClient:
+    """
+    Asyncio client of a `TraceServer`.
+
+    >>> client = await TraceClient.connect(path="/tmp/pyoptics.sock")
+    >>> await client.load("cfg1", path="examples/cfg1.pyop")
+    >>> result = await client.trace("cfg1", steps=50)
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+        self._tags = itertools.count()
+        self._pending: dict[int, asyncio.Future] = {}
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(
+        cls, path: str | None = None, host: str = "127.0.0.1", port: int | None = None
+    ) -> "TraceClient":
+        """Connect to a server on a Unix socket at `path`, or on `host` and `port`"""
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _receive(self) -> None:
+        try:
+            while True:
+                header, arrays = await _read(self._reader)
+                future = self._pending.pop(header.get("tag"), None)
+                if future is not None and not future.done():
+                    future.set_result((header, arrays))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(
+                        ConnectionError("Connection to the server closed")
+                    )
+            self._pending.clear()
+
+    async def request(
+        self, request: dict[str, Any], arrays=()
+    ) -> tuple[dict[str, Any], list[np.ndarray]]:
+        """Send a raw request and wait for its response"""
+        tag = next(self._tags)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tag] = future
+
+        self._writer.write(_encode(dict(request, tag=tag), arrays))
+        await self._writer.drain()
+
+        header, result = await future
+        if not header.get("ok"):
+            raise ServerError(header.get("error"))
+        return header, result
+
+    async def load(
+        self, scene: str, path: str | None = None, config: str | None = None
+    ) -> dict[str, Any]:
+        """Load a scene from a config file on the server or from config text"""
+        request: dict[str, Any] = {"op": "load", "scene": scene}
+        if config is not None:
+            request["config"] = config
+        else:
+            request["path"] = path
+        header, _ = await self.request(request)
+        return header
+
+    async def update(self, scene: str, index: int, attribute: str, value) -> None:
+        """
+        Set an attribute of the object at `index` (optics first, then emitters).
+
+        Rotations are in radians, given like to the constructors, also for flat mirrors.
+        """
+        await self.request(
+            {
+                "op": "update",
+                "scene": scene,
+                "index": index,
+                "attribute": attribute,
+                "value": np.asarray(value, dtype=float).tolist(),
+            }
+        )
+
+    async def trace(
+        self, scene: str, steps: int = 20, origins=None, directions=None
+    ) -> TraceResult:
+        """Trace the emitters of a scene, or the given (R, 2) origins and directions"""
+        arrays = ()
+        if origins is not None:
+            arrays = (
+                np.asarray(origins, dtype=float),
+                np.asarray(directions, dtype=float),
+            )
+        _, (points, bounces) = await self.request(
+            {"op": "trace", "scene": scene, "steps": steps}, arrays
+        )
+        return TraceResult(points, bounces)
+
+    async def drop(self, scene: str) -> None:
+        """Unload a scene"""
+        await self.request({"op": "drop", "scene": scene})
+
+    async def scenes(self) -> list[str]:
+        """Ids of the loaded scenes"""
+        header, _ = await self.request({"op": "scenes"})
+        return header["scenes"]
+
+    async def close(self) -> None:
+        """Close the connection"""
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._receiver.cancel()
@@ -1,86 +1,155 @@
-from math import radians
-
+from difflib import SequenceMatcher
 
+import numpy as np
 from pygame import Surface
 
-from .optics2d import FlatMirror, Lens, OpticSystem, RayEmitter, SphericalMirror
-from .renderer import RenderScene
-
-
-class ConfigError(Exception):
-    """Raised by the PyOptics library when a error occurs during the processing of a config file"""
+# config parsing lives in `config`, which does not need pygame, and is re-exported here
+from .config import FAN_RAYS, ConfigError, parse_cfg, parse_cfg_lines
+from .optics2d import (
+    FlatMirror,
+    Lens,
+    OpticSystem,
+    PolylineMirror,
+    RayEmitter,
+    SphericalMirror,
+)
+from .optics2d.kernels import segment_box_overlap
+from .renderer import RenderRay, RenderScene
+
+
+# attributes set from a config line, compared when a config is reloaded
+_CFG_ATTRIBUTES: dict[type, tuple[str, ...]] = {
+    FlatMirror: ("location", "rotation", "scale"),
+    SphericalMirror: ("location", "rotation", "scale", "focal"),
+    PolylineMirror: ("location", "rotation", "scale", "vertices"),
+    Lens: ("location", "rotation", "scale", "focal1", "focal2", "index", "thickness"),
+    RayEmitter: ("location", "rotation"),
+}
 
 
 def scene_from_cfg(
     path: str, scr: Surface, steps=1, scale=40.0, middle=(300, 300)
 ) -> RenderScene:
-    with open(path, "r") as f:
-
-        optics: list[FlatMirror | SphericalMirror | Lens] = []
-        rays: list[RayEmitter] = []
-        for line in f.readlines():
-            line = line.strip()
-
-            # remove comments
-            if "#" in line:
-                line = line[: line.index("#")]
-
-            if line.isspace():
+    optics, rays = parse_cfg(path)
+    system = OpticSystem(optics, rays)
+
+    return RenderScene(system, scr, steps, scale, middle)
+
+
+def _cfg_type(obj) -> type:
+    """Type of the config line describing an object, also for views of compact systems"""
+    return next(cls for cls in _CFG_ATTRIBUTES if isinstance(obj, cls))
+
+
+def _signature(obj) -> tuple:
+    cls = _cfg_type(obj)
+    return (cls,) + tuple(
+        np.asarray(getattr(obj, attr), dtype=float).tobytes()
+        for attr in _CFG_ATTRIBUTES[cls]
+    )
+
+
+def _bounds(obj) -> np.ndarray | None:
+    """Bounding box of an optic, None if it is not known"""
+    try:
+        return np.asarray(obj.compiled.bounds, dtype=float)
+    except NotImplementedError:
+        return None
+
+
+def _update(old: list, new: list) -> tuple[list, list, list, list]:
+    """
+    Match the objects of `old` to the freshly parsed `new` ones.
+
+    Objects present in both are updated in place, so only the attributes which
+    changed in the file are set.
+
+    Returns
+    -------
+    tuple[list, list, list, list]
+        The resulting list in file order, objects updated in place, removed and added.
+    """
+    result, updated, removed, added = [], [], [], []
+
+    matcher = SequenceMatcher(
+        None, list(map(_signature, old)), list(map(_signature, new)), autojunk=False
+    )
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            result.extend(old[i1:i2])
+            continue
+
+        before, after = old[i1:i2], new[j1:j2]
+        for i, obj in enumerate(after):
+            if i < len(before) and _cfg_type(before[i]) is type(obj):
+                live = before[i]
+                for attr in _CFG_ATTRIBUTES[type(obj)]:
+                    value = getattr(obj, attr)
+                    if not np.array_equal(getattr(live, attr), value):
+                        setattr(live, attr, value)
+                updated.append(live)
+                result.append(live)
+            else:
+                if i < len(before):
+                    removed.append(before[i])
+                added.append(obj)
+                result.append(obj)
+        removed.extend(before[len(after) :])
+
+    return result, updated, removed, added
+
+
+def update_scene_from_cfg(path: str, scene: RenderScene) -> list[RayEmitter]:
+    """
+    Bring a scene up to date with its (edited) config file.
+
+    Only the optics and emitters which changed are updated, removed or added,
+    together with their renderers.
+
+    Returns
+    -------
+    list[RayEmitter]
+        Emitters which have to be traced again: the changed ones and the ones whose
+        current path passes through the region of a changed optic.
+    """
+    optics, rays = parse_cfg(path)
+    system = scene.system
+    # objects are compared by equality, views of a compact system are created on access
+    compact = not isinstance(system.optics, list)
+
+    old = list(system.optics)
+    previous = {obj: _bounds(obj) for obj in old}
+
+    optics, updated, removed, added = _update(old, optics)
+    # regions changed by the edit, as seen before and after it
+    regions = [previous[obj] for obj in updated + removed]
+    for obj in removed:
+        scene.remove(obj)
+    for obj in added:
+        scene.add(obj)
+    regions.extend(_bounds(obj) for obj in updated + added)
+    if not compact:
+        # a compact system keeps its own order
+        system.optics[:] = optics
+
+    rays, changed, removed, added = _update(list(system.rays), rays)
+    for obj in removed:
+        scene.remove(obj)
+    added = [scene.add(obj) for obj in added]
+    if not compact:
+        system.rays[:] = rays
+
+    if any(region is None for region in regions):
+        return list(system.rays)
+
+    affected = set(changed + added)
+    if regions:
+        boxes = np.array(regions)
+        for renderer in scene.object_renderers:
+            if not isinstance(renderer, RenderRay) or renderer.obj in affected:
                 continue
+            path = renderer.path()
+            if segment_box_overlap(path[:-1], path[1:], boxes).any():
+                affected.add(renderer.obj)
 
-            elems = line.split(",")
-            obj_type = elems[0].strip()
-            obj_args = tuple(map(lambda x: float(x.strip()), elems[1:]))
-            l = len(obj_args)
-            match obj_type:
-                case "F":
-                    if l != 4:
-                        raise ConfigError(
-                            f"A FlatMirror instance needs 4 arguments, not {l}"
-                        )
-                    optics.append(
-                        FlatMirror(
-                            (obj_args[0], obj_args[1]),
-                            radians(obj_args[2]),
-                            obj_args[3],
-                        )
-                    )
-
-                case "S":
-                    if l != 4 and l != 5:
-                        raise ConfigError(
-                            f"A SphericalMirror instance needs 4 or 5 arguments, not {l}"
-                        )
-                    optics.append(
-                        SphericalMirror(
-                            (obj_args[0], obj_args[1]),
-                            radians(obj_args[2]),
-                            *obj_args[3:],
-                        )
-                    )
-
-                case "L":
-                    if l != 4 and l != 5 and l != 6:
-                        raise ConfigError(
-                            f"A Lens instance needs 4, 5 or 6 arguments, not {l}"
-                        )
-                    optics.append(
-                        Lens(
-                            (obj_args[0], obj_args[1]),
-                            radians(obj_args[2]),
-                            *obj_args[3:],
-                        )
-                    )
-
-                case "R" | "E":
-                    if l != 3:
-                        raise ConfigError(
-                            f"A RayEmitter instance needs 3 arguments, not {l}"
-                        )
-                    rays.append(
-                        RayEmitter((obj_args[0], obj_args[1]), radians(obj_args[2]))
-                    )
-
-        system = OpticSystem(optics, rays)
-
-        return RenderScene(system, scr, steps, scale, middle)
+    return [ray for ray in system.rays if ray in affected]
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+
+from pyoptics import batch as batch_module
+from pyoptics.__main__ import batch
+from pyoptics.batch import find_configs, trace_configs, write_report
+
+
+SCENE = "F, 2, 0, 0, 2\nE, 0, 0, 0\n"
+
+
+def write_configs(directory, broken=False):
+    (directory / "a.pyop").write_text(SCENE)
+    (directory / "c.pyop").write_text(SCENE.replace("E, 0, 0", "E, 0, 0.5"))
+    if broken:
+        (directory / "b.pyop").write_text("F, 1, 2\n")
+    return find_configs(str(directory))
+
+
+def test_failures_do_not_stop_the_batch(tmp_path):
+    paths = write_configs(tmp_path, broken=True)
+    assert [os.path.basename(path) for path in paths] == ["a.pyop", "b.pyop", "c.pyop"]
+
+    results = trace_configs(paths, steps=5, workers=2)
+    assert [result.path for result in results] == paths
+    assert [result.ok for result in results] == [True, False, True]
+    assert "ConfigError" in results[1].error
+    np.testing.assert_allclose(results[0].endpoints, [[2, 0]], atol=1e-9)
+    np.testing.assert_allclose(results[2].endpoints, [[2, 0.5]], atol=1e-9)
+
+
+def test_timeout(tmp_path, monkeypatch):
+    paths = write_configs(tmp_path)
+    parse_cfg = batch_module.parse_cfg
+
+    def slow(path):
+        if path.endswith("a.pyop"):
+            time.sleep(1)
+        return parse_cfg(path)
+
+    monkeypatch.setattr(batch_module, "parse_cfg", slow)
+    results = trace_configs(paths, steps=5, workers=1, timeout=0.1)
+    assert results[0].error.startswith("TimeoutError")
+    assert results[1].ok
+
+
+def test_timeout_outside_the_main_thread(tmp_path):
+    paths = write_configs(tmp_path)
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.extend(trace_configs(paths, steps=5, workers=1, timeout=10))
+    )
+    thread.start()
+    thread.join()
+    assert [result.ok for result in results] == [True, True]
+
+
+def test_report_and_exit_code(tmp_path):
+    output = tmp_path / "report.json"
+    args = argparse.Namespace(
+        batch=str(tmp_path), steps=5, workers=1, timeout=10, output=str(output)
+    )
+    write_configs(tmp_path)
+    assert batch(args) == 0
+
+    (tmp_path / "b.pyop").write_text("X, 1\nF, 1\n")
+    assert batch(args) == 1
+    report = json.loads(output.read_text())
+    assert report["scenes"] == 3
+    assert report["failed"] == 1
+    failed = report["results"][1]
+    assert failed["path"].endswith("b.pyop") and not failed["ok"]
+    assert failed["endpoints"] is None
+    assert report["results"][0]["bounces"] == [1]
+
+    args.batch = str(tmp_path / "missing")
+    assert batch(args) == 1
+
+
+def test_batch_without_pygame(tmp_path):
+    paths = write_configs(tmp_path)
+    code = (
+        "import sys; sys.modules['pygame'] = None\n"
+        "from pyoptics.batch import trace_configs\n"
+        f"print(trace_configs({paths!r}, 5, workers=1)[0].ok)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "True"
+
+
+def test_write_report_round_trip(tmp_path):
+    results = trace_configs(write_configs(tmp_path), steps=5, workers=1)
+    write_report(results, tmp_path / "out.json")
+    report = json.loads((tmp_path / "out.json").read_text())
+    np.testing.assert_allclose(report["results"][1]["endpoints"], [[2, 0.5]], atol=1e-9)
@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pygame
+import pytest
+
+from pyoptics.optics2d import (
+    FlatMirror,
+    Lens,
+    OpticSystem,
+    PolylineMirror,
+    RayEmitter,
+    SphericalMirror,
+)
+from pyoptics.optics2d.compact import CompactOpticSystem
+from pyoptics.renderer import RenderScene
+from pyoptics.utils import update_scene_from_cfg
+
+
+def random_objects(count=30, seed=0):
+    rng = np.random.default_rng(seed)
+    objects = []
+    for i in range(count):
+        location = rng.uniform(-5, 5, 2)
+        rotation = rng.uniform(-np.pi, np.pi)
+        match i % 3:
+            case 0:
+                objects.append(FlatMirror(location, rotation, 2))
+            case 1:
+                objects.append(SphericalMirror(location, rotation, 1, rng.choice((-1, 1))))
+            case _:
+                objects.append(RayEmitter(location, rotation))
+    return objects
+
+
+def split(objects):
+    """Optics in the order of a compact system and emitters"""
+    optics = [o for o in objects if isinstance(o, FlatMirror)]
+    optics += [o for o in objects if isinstance(o, SphericalMirror)]
+    return optics, [o for o in objects if isinstance(o, RayEmitter)]
+
+
+def assert_same_trace(compact, regular, steps=10):
+    np.testing.assert_allclose(compact.trace(steps).points, regular.trace(steps).points)
+    compact_scene, regular_scene = compact.compile(), regular.compile()
+    for name in ("flat_start", "flat_end", "sphere_center", "sphere_radius"):
+        np.testing.assert_allclose(
+            getattr(compact_scene.geometry, name), getattr(regular_scene.geometry, name)
+        )
+    np.testing.assert_allclose(compact_scene.sphere_arc, regular_scene.sphere_arc)
+
+
+def test_trace_matches_regular_system():
+    objects = random_objects()
+    assert_same_trace(CompactOpticSystem(*split(objects)), OpticSystem(*split(objects)))
+
+
+def test_step_matches_regular_system():
+    objects = random_objects()
+    compact, regular = CompactOpticSystem(*split(objects)), OpticSystem(*split(objects))
+    for system in (compact, regular):
+        system.reset()
+        for _ in range(5):
+            system.step()
+    for a, b in zip(compact.rays, regular.rays):
+        np.testing.assert_allclose(a.current_ray_location, b.current_ray_location)
+        assert len(a.bounce_locations) == len(b.bounce_locations)
+
+
+def test_views_modify_columns():
+    compact = CompactOpticSystem(*split(random_objects()))
+    view = compact.optics[0]
+    view.location = (1, 2)
+    np.testing.assert_array_equal(compact.optics[0].location, (1, 2))
+    assert compact.optics[0] == view
+
+
+def test_remove_compacts_columns():
+    optics, rays = split(random_objects())
+    compact = CompactOpticSystem(optics, rays)
+    compact.compile()
+    later = compact.optics[3]
+
+    compact.remove(compact.optics[1])
+    compact.remove(compact.rays[0])
+    del optics[1], rays[0]
+
+    assert len(compact.optics) == len(optics)
+    assert later == compact.optics[2]
+    np.testing.assert_allclose(later.location, optics[2].location)
+    assert_same_trace(compact, OpticSystem(optics, rays))
+
+    with pytest.raises(ValueError):
+        compact.remove(FlatMirror((0, 0), 0, 1))
+
+
+def test_direct_removal_drops_snapshot():
+    compact = CompactOpticSystem(
+        [FlatMirror((2, 0), 0, 1), FlatMirror((5, 0), 0, 1)], [RayEmitter((0, 0), 0)]
+    )
+    compact.compile()
+    compact.optics.remove(compact.optics[0])
+    # same row count and versions as before the removal
+    compact.add(FlatMirror((9, 0), 0, 1))
+    np.testing.assert_allclose(compact.trace(3).endpoints(), [[5, 0]], atol=1e-9)
+
+
+def test_unsupported_optics():
+    compact = CompactOpticSystem()
+    with pytest.raises(TypeError):
+        compact.add(Lens((0, 0), 0, 1))
+    with pytest.raises(TypeError):
+        compact.add(PolylineMirror((0, 0), 0, [(0, 0), (1, 0)]))
+
+
+def test_render_scene_and_watch_on_compact_system(tmp_path):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    config = tmp_path / "scene.pyop"
+    config.write_text("F, 2, 0, 0, 4\nF, -2, 8, 0, 1\nE, 0, 0, 0\nE, 0, 5, 180\n")
+
+    from pyoptics.utils import parse_cfg
+
+    scene = RenderScene(CompactOpticSystem(*parse_cfg(str(config))), pygame.Surface((60, 60)))
+    scene.remove(scene.system.optics[1])
+    assert len(scene.object_renderers) == 3
+    scene.reset()
+    scene.run()
+
+    # only the second ray passes the new mirror, the removed one comes back off the paths
+    config.write_text(
+        "F, 2, 0, 0, 4\nF, -2, 8, 0, 1\nF, -3, 5, 0, 2\nE, 0, 0, 0\nE, 0, 5, 180\n"
+    )
+    rays = update_scene_from_cfg(str(config), scene)
+    assert len(scene.system.optics) == 3
+    assert len(scene.object_renderers) == 5
+    assert rays == [scene.system.rays[1]]
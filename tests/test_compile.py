@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from pyoptics.optics2d import (
+    FlatMirror,
+    Lens,
+    OpticSystem,
+    PolylineMirror,
+    RayEmitter,
+    SphericalMirror,
+)
+
+
+def make_system():
+    return OpticSystem(
+        [
+            SphericalMirror((3, 0), np.pi, 2, 2),
+            FlatMirror((0, 5), 0, 10),
+            PolylineMirror((0, -5), 0, [(-1, 0), (0, 0.1), (1, 0)]),
+            Lens((-4, 0), 0, 2, 1, 1, thickness=0.3),
+        ],
+        [RayEmitter((0, 0), 0.3), RayEmitter((0, 0), 2.5)],
+    )
+
+
+def test_unchanged_scene_is_reused():
+    system = make_system()
+    assert system.compile() is system.compile()
+
+
+def test_setter_recompiles_only_its_rows():
+    system = make_system()
+    before = system.compile()
+    flat = system.optics[1]
+
+    flat.location = (0, 6)
+    after = system.compile()
+
+    assert after is not before
+    np.testing.assert_allclose(after.geometry.flat_start[0], (0, 11), atol=1e-12)
+    np.testing.assert_array_equal(
+        after.geometry.flat_start[1:], before.geometry.flat_start[1:]
+    )
+    np.testing.assert_array_equal(
+        after.geometry.sphere_center, before.geometry.sphere_center
+    )
+    np.testing.assert_allclose(
+        system.trace(10).points, OpticSystem(system.optics, system.rays).trace(10).points
+    )
+
+
+def test_in_place_changes_are_rejected():
+    system = make_system()
+    scene = system.compile()
+
+    for optic in system.optics:
+        with pytest.raises(ValueError):
+            optic.location[0] = 5
+    with pytest.raises(ValueError):
+        system.optics[2].vertices[0, 0] = 5
+
+    assert system.compile() is scene
+    with pytest.raises(ValueError):
+        scene.geometry.flat_start[0, 0] = 5
+
+
+def test_location_is_copied():
+    location = np.array((1.0, 2.0))
+    mirror = FlatMirror(location, 0, 1)
+    location[0] = 5
+    np.testing.assert_array_equal(mirror.location, (1, 2))
+
+
+@pytest.mark.parametrize("focal", [2, -2])
+def test_spherical_arc_ends_at_mirror_edges(focal):
+    mirror = SphericalMirror((1, 1), 0.4, 2, focal)
+    geometry = mirror.compiled
+
+    for angle in geometry.arc:
+        edge = geometry.center + abs(geometry.radius) * np.array(
+            (np.cos(angle), np.sin(angle))
+        )
+        assert np.linalg.norm(edge - mirror.location) == pytest.approx(geometry.reach)
+    middle = np.mean(geometry.arc)
+    vertex = geometry.center + abs(geometry.radius) * np.array(
+        (np.cos(middle), np.sin(middle))
+    )
+    np.testing.assert_allclose(vertex, mirror.location)
@@ -0,0 +1,79 @@
+import os
+import sys
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import pytest
+
+from pyoptics.__main__ import main
+from pyoptics.export import Sweep, render_frames
+from pyoptics.optics2d import FlatMirror, OpticSystem, RayEmitter, SphericalMirror
+from pyoptics.utils import parse_cfg_lines
+
+
+def make_system():
+    return OpticSystem(
+        [FlatMirror((2, 0), 0, 4), SphericalMirror((-2, 0), np.pi, 2, 2)],
+        [RayEmitter((0, 0.5), 0.2)],
+    )
+
+
+def test_sweep_reaches_both_ends():
+    system = make_system()
+    sweep = Sweep(2, "location", (0, 0), (1, 2), 5)
+
+    sweep(system, 0)
+    np.testing.assert_allclose(system.rays[0].location, (0, 0))
+    sweep(system, 2)
+    np.testing.assert_allclose(system.rays[0].location, (0.5, 1))
+    sweep(system, 4)
+    np.testing.assert_allclose(system.rays[0].location, (1, 2))
+
+    single = Sweep(1, "focal", 3, 4, 1)
+    single(system, 0)
+    assert system.optics[1].focal == 3
+
+
+@pytest.mark.parametrize("degrees", [0, 30, -75])
+def test_flat_mirror_rotation_like_config(degrees):
+    system = make_system()
+    Sweep(0, "rotation", 0, np.radians(degrees), 2)(system, 1)
+
+    (expected,), _ = parse_cfg_lines([f"F, 2, 0, {degrees}, 4"])
+    assert system.optics[0].rotation == pytest.approx(expected.rotation)
+
+
+def test_render_frames(tmp_path):
+    system = make_system()
+    sweep = Sweep(0, "location", (2, 0), (3, 0), 3)
+    options = dict(size=(80, 60), steps=5, scale=10)
+
+    serial = render_frames(system, sweep, 3, str(tmp_path / "serial"), workers=1, **options)
+    parallel = render_frames(
+        system, sweep, 3, str(tmp_path / "parallel"), workers=2, **options
+    )
+
+    assert [os.path.basename(p) for p in serial] == [
+        "frame_00000.png",
+        "frame_00001.png",
+        "frame_00002.png",
+    ]
+    images = [pygame.surfarray.array3d(pygame.image.load(p)) for p in serial + parallel]
+    for a, b in zip(images[:3], images[3:]):
+        np.testing.assert_array_equal(a, b)
+    assert (images[0] != images[2]).any()
+    assert images[0].any()
+
+
+@pytest.mark.parametrize("attribute", ["location", "vertices"])
+def test_sweep_rejects_coordinates(monkeypatch, capsys, tmp_path, attribute):
+    monkeypatch.setattr(
+        sys, "argv", ["pyoptics", "-e", str(tmp_path), "--sweep", "0", attribute, "0", "1"]
+    )
+    with pytest.raises(SystemExit) as exited:
+        main()
+    assert exited.value.code == 2
+    assert f"cannot change {attribute!r}" in capsys.readouterr().err
+    assert not list(tmp_path.iterdir())
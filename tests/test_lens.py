@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from pyoptics.optics2d import Lens, OpticSystem, RayEmitter
+from pyoptics.optics2d.kernels import refract
+
+
+def axis_crossings(system, heights, steps=3):
+    """x where every ray, after its last bounce, crosses the optical axis y = 0"""
+    result = system.trace(steps)
+    ends = result.endpoints()
+    after = result.points[np.arange(len(heights)), result.bounces + 1]
+    direction = after - ends
+    return ends[:, 0] - ends[:, 1] * direction[:, 0] / direction[:, 1]
+
+
+def beam(heights, x=-5):
+    return [RayEmitter((x, h), 0) for h in heights]
+
+
+@pytest.mark.parametrize("focal, expected", [(1, 2), (-1, -2)])
+def test_thin_lens_focus(focal, expected):
+    heights = [-1, -0.3, 0.2, 0.9]
+    lens = Lens((0, 0), 0, 4, focal, focal)
+    assert 1 / lens.power == pytest.approx(expected)
+
+    system = OpticSystem([lens], beam(heights))
+    np.testing.assert_allclose(axis_crossings(system, heights), expected)
+
+
+def test_thick_lens_back_focal_length():
+    n, radius, thickness = 1.5, 2.0, 0.2
+    lens = Lens((0, 0), 0, 2, radius / 2, radius / 2, n, thickness)
+    system = OpticSystem([lens], beam([0.001, -0.002]))
+
+    power = (n - 1) * (2 / radius - (n - 1) * thickness / (n * radius**2))
+    back_focal = (1 - (n - 1) * thickness / (n * radius)) / power
+    np.testing.assert_allclose(
+        axis_crossings(system, [0.001, -0.002]), thickness / 2 + back_focal, rtol=1e-5
+    )
+
+
+def test_total_internal_reflection():
+    direction = np.array((np.cos(1.1), np.sin(1.1)))
+    normal = np.array((1.0, 0.0))
+    # leaving the glass at 63 degrees, above the critical angle of 41.8 degrees
+    reflected = refract(direction, normal, 1.5)
+    np.testing.assert_allclose(reflected, direction * (-1, 1))
+    # entering the glass is always possible
+    entering = refract(-direction, normal, 1.5)
+    assert np.dot(entering, -normal) > 0
+
+    # a ray inside a thick lens bounces off its surfaces instead of leaving
+    lens = Lens((0, 0), 0, 6, 50, 50, 1.5, 1)
+    system = OpticSystem([lens], [RayEmitter((0, 0), 1.1)])
+    result = system.trace(2)
+    geometry = lens.compiled
+    assert result.bounces[0] == 2
+    # the front surface, then the back one
+    for point, surface in zip(result.points[0, 1:], (0, 1)):
+        assert np.linalg.norm(point - geometry.center[surface]) == pytest.approx(
+            abs(geometry.radius[surface])
+        )
+    assert result.points[0, 1, 0] > 0 > result.points[0, 2, 0]
+
+
+@pytest.mark.parametrize("thickness", [0, 0.4])
+def test_trace_matches_step(thickness):
+    lens = Lens((1, 0.5), 0.3, 3, 1.5, -4, 1.6, thickness)
+    rays = [RayEmitter((-4, y), 0.1) for y in np.linspace(-0.5, 1, 5)]
+    system = OpticSystem([lens], rays)
+
+    result = system.trace(5)
+    system.reset()
+    for _ in range(5):
+        if system.step():
+            break
+    np.testing.assert_allclose(
+        result.endpoints(), [r.bounce_locations[-1] for r in system.rays], atol=1e-9
+    )
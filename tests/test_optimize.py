@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from pyoptics.optics2d import (
+    FlatMirror,
+    Lens,
+    OpticSystem,
+    PolylineMirror,
+    RayEmitter,
+    SphericalMirror,
+)
+from pyoptics.optimize import (
+    MISS_PENALTY,
+    DesignProblem,
+    Parameter,
+    TargetDistance,
+    cma_es,
+    spot_rms,
+)
+
+
+def beam(*heights):
+    return [RayEmitter((0, y), 0) for y in heights]
+
+
+@pytest.mark.parametrize(
+    "optic, attribute",
+    [
+        (Lens((5, 0), 0, 4, 1, 1), "focal1"),
+        (Lens((5, 0), 0, 4, 1, 1.5, thickness=0.5), "index"),
+        (PolylineMirror((3, 0), 0, [(0, -1), (0, 1)]), "scale"),
+        (SphericalMirror((6, 0), np.pi, 3, 2), "focal"),
+    ],
+)
+def test_trace_matches_system(optic, attribute):
+    system = OpticSystem(
+        [optic, FlatMirror((10, 0), 0, 10)], beam(0.5, -0.5, 0.1)
+    )
+    problem = DesignProblem(system, [Parameter(optic, attribute)], spot_rms)
+
+    expected = system.trace(problem.steps)
+    result = problem.trace(problem.x0())
+    np.testing.assert_allclose(result.points[0], expected.points)
+    np.testing.assert_array_equal(result.bounces[0], expected.bounces)
+
+
+@pytest.mark.parametrize(
+    "make, attribute, values",
+    [
+        (lambda: FlatMirror((8, 0), 0.3, 6), "rotation", [0.1, 0.5]),
+        (lambda: SphericalMirror((6, 0), np.pi, 3, 2), "location", [[6, 0.5], [7, 0]]),
+        (lambda: Lens((5, 0), 0, 4, 1, 1), "focal2", [0.8, 3]),
+        (lambda: Lens((5, 0), 0, 4, 1, 1.5, thickness=0.5), "thickness", [0.2, 0.8]),
+        (lambda: PolylineMirror((3, 0), 0.2, [(0, -1), (0, 1)]), "rotation", [0, 0.4]),
+    ],
+)
+def test_candidates_match_changed_systems(make, attribute, values):
+    optic = make()
+    system = OpticSystem([optic, FlatMirror((10, 0), 0, 10)], beam(0.5, -0.5, 0.1))
+    problem = DesignProblem(
+        system, [Parameter(optic, attribute, lower=0.01)], spot_rms
+    )
+    population = np.array(values, dtype=float).reshape(len(values), -1)
+    result = problem.trace(population)
+
+    for candidate, value in enumerate(values):
+        changed = make()
+        setattr(changed, attribute, np.asarray(value, dtype=float) if np.ndim(value) else value)
+        expected = OpticSystem(
+            [changed, FlatMirror((10, 0), 0, 10)], beam(0.5, -0.5, 0.1)
+        ).trace(problem.steps)
+        np.testing.assert_allclose(result.points[candidate], expected.points, atol=1e-9)
+        np.testing.assert_array_equal(result.bounces[candidate], expected.bounces)
+
+
+def test_candidates_change_only_their_trace():
+    mirror = FlatMirror((3, 0), 0, 4)
+    system = OpticSystem([mirror], beam(0.2))
+    problem = DesignProblem(system, [Parameter(mirror, "location")], spot_rms)
+
+    result = problem.trace([[3, 0], [4, 0], [5, 1]])
+    np.testing.assert_allclose(result.endpoints()[:, 0], [[3, 0.2], [4, 0.2], [5, 0.2]])
+    np.testing.assert_array_equal(mirror.location, (3, 0))
+
+
+def test_missed_rays_are_penalized():
+    mirror = FlatMirror((3, 0), 0, 2)
+    system = OpticSystem([mirror], [RayEmitter((0, 0.2), 0), RayEmitter((0, -0.2), 0.1)])
+    problem = DesignProblem(system, [Parameter(mirror, "location")], spot_rms)
+
+    near, away = problem.evaluate([problem.x0(), [100, 100]])
+    assert near < 1
+    assert away == MISS_PENALTY
+
+    target = DesignProblem(
+        system, [Parameter(mirror, "location")], TargetDistance((3, 0))
+    )
+    assert target.evaluate([[100, 100]])[0] == MISS_PENALTY
+
+
+def test_invalid_parameters():
+    mirror = FlatMirror((3, 0), 0, 2)
+    system = OpticSystem([mirror], beam(0))
+
+    with pytest.raises(ValueError):
+        DesignProblem(system, [], spot_rms)
+    with pytest.raises(ValueError):
+        DesignProblem(system, [Parameter(FlatMirror((0, 0), 0, 1), "scale")], spot_rms)
+    with pytest.raises(ValueError):
+        Parameter(mirror, "focal")
+    with pytest.raises(ValueError):
+        Parameter(Lens((0, 0), 0, 1), "thickness", 0.1)
+
+
+def test_cma_es_moves_mirror_onto_target():
+    mirror = FlatMirror((3, 0), 0, 4)
+    system = OpticSystem([mirror], beam(0.2, -0.2))
+    problem = DesignProblem(
+        system, [Parameter(mirror, "location")], TargetDistance((4, 0))
+    )
+    start = problem.evaluate(problem.x0())[0]
+
+    result = cma_es(problem, sigma=0.3, generations=100, seed=0)
+    assert result.cost < start
+    assert result.x[0] == pytest.approx(4, abs=1e-3)
+
+
+def test_candidates_with_many_flat_rows():
+    # enough segments for the compiled scene to split its flat rows into blocks
+    angles = np.linspace(-1, 1, 40)
+    vertices = np.stack((np.cos(angles), np.sin(angles)), axis=-1)
+    polyline = PolylineMirror((6, 0), 0, vertices)
+    mirror = FlatMirror((3, 5), 0, 4)
+    system = OpticSystem([mirror, polyline], beam(0.5, -0.5, -5))
+    problem = DesignProblem(system, [Parameter(mirror, "location")], spot_rms)
+
+    # the mirror moves far away from the block it was compiled into
+    result = problem.trace([[3, 5], [3, -5]])
+    for candidate, location in enumerate([(3, 5), (3, -5)]):
+        expected = OpticSystem(
+            [FlatMirror(location, 0, 4), PolylineMirror((6, 0), 0, vertices)],
+            beam(0.5, -0.5, -5),
+        ).trace(problem.steps)
+        np.testing.assert_allclose(result.points[candidate], expected.points, atol=1e-9)
+    np.testing.assert_allclose(result.endpoints()[1, 2], [3, -5])
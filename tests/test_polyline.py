@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from pyoptics.optics2d import OpticSystem, PolylineMirror, RayEmitter, SphericalMirror
+from pyoptics.optics2d.kernels import intersect_segments, segment_blocks, trace, unit_vectors
+from pyoptics.utils import parse_cfg_lines
+
+
+def step_endpoints(system, steps):
+    system.reset()
+    for _ in range(steps):
+        if system.step():
+            break
+    return np.array([r.bounce_locations[-1] for r in system.rays])
+
+
+def test_smooth_normals_are_interpolated():
+    # a roof: both segments tilt by 45 degrees, the normal at the ridge points straight up
+    mirror = PolylineMirror((0, 0), 0, [(-1, -1), (0, 0), (1, -1)], smooth=True)
+    geometry = mirror.compiled
+    np.testing.assert_allclose(geometry.vertex_normals[0, 1], (0, 1), atol=1e-12)
+    np.testing.assert_allclose(geometry.vertex_normals[1, 0], (0, 1), atol=1e-12)
+
+    # halfway along the left segment the normal is halfway between both ends
+    system = OpticSystem([mirror], [RayEmitter((-0.5, 5), -np.pi / 2)])
+    result = system.trace(1)
+    np.testing.assert_allclose(result.points[0, 1], (-0.5, -0.5))
+
+    expected = np.array((-1, 1)) / np.sqrt(2) + (0, 1)
+    expected /= np.linalg.norm(expected)
+    direction = np.array((0.0, -1.0))
+    reflected = direction - 2 * direction.dot(expected) * expected
+    actual = system.trace(2).points[0, 2] - result.points[0, 1]
+    np.testing.assert_allclose(actual / np.linalg.norm(actual), reflected, atol=1e-12)
+
+
+@pytest.mark.parametrize("smooth", [False, True])
+def test_trace_matches_step(smooth):
+    angles = np.linspace(0, np.pi, 50)
+    vertices = np.stack((np.cos(angles), np.sin(angles)), axis=-1) * 3
+    mirror = PolylineMirror((0, 0), 0.3, vertices, smooth=smooth)
+    rays = [RayEmitter((0, 1), a) for a in np.linspace(0.2, 2.9, 7)]
+    system = OpticSystem([mirror], rays)
+
+    result = system.trace(20)
+    assert (result.bounces < 20).all()
+    np.testing.assert_allclose(result.endpoints(), step_endpoints(system, 20), atol=1e-9)
+
+
+def test_segment_index_finds_every_hit():
+    rng = np.random.default_rng(1)
+    mirror = PolylineMirror((0, 0), 0, np.cumsum(rng.normal(size=(200, 2)), axis=0))
+    geometry = mirror.compiled
+    for origin, angle in zip(rng.uniform(-5, 5, (50, 2)), rng.uniform(-np.pi, np.pi, 50)):
+        direction = unit_vectors(angle)
+        distance = intersect_segments(
+            origin[None], direction[None], geometry.start, geometry.end
+        ).min()
+        bounce = mirror.get_bounce(RayEmitter(origin, angle))
+        if np.isfinite(distance):
+            np.testing.assert_allclose(bounce[0], origin + distance * direction)
+        else:
+            assert bounce is None
+
+
+def test_repeated_vertices_are_dropped():
+    (mirror,), _ = parse_cfg_lines(["P, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 1, 0, 1, 1"])
+    np.testing.assert_array_equal(mirror.vertices, [(0, 0), (1, 0), (1, 1)])
+    geometry = mirror.compiled
+    assert np.isfinite(geometry.normals).all()
+    assert np.isfinite(geometry.vertex_normals).all()
+
+    with pytest.raises(ValueError):
+        PolylineMirror((0, 0), 0, [(1, 1), (1, 1)])
+    with pytest.raises(ValueError):
+        mirror.vertices = [(0, 0)]
+
+
+def test_trace_uses_blocks_like_full_search():
+    rng = np.random.default_rng(2)
+    mirror = PolylineMirror((0, 0), 0, np.cumsum(rng.normal(size=(300, 2)), axis=0))
+    rays = [RayEmitter(o, a) for o, a in zip(rng.uniform(-5, 5, (40, 2)), rng.uniform(-3, 3, 40))]
+    system = OpticSystem([mirror, SphericalMirror((0, 8), 1, 4, 3)], rays)
+    geometry = system.compile().geometry
+    assert geometry.flat_blocks.shape == (19, 4)
+
+    origins = np.array([r.location for r in rays])
+    directions = unit_vectors([r.rotation for r in rays])
+    # a batch of two scenes, the second one moved
+    batched = geometry._replace(
+        flat_start=np.stack((geometry.flat_start, geometry.flat_start + 1)),
+        flat_end=np.stack((geometry.flat_end, geometry.flat_end + 1)),
+    )
+    batched = batched._replace(
+        flat_blocks=segment_blocks(batched.flat_start, batched.flat_end)
+    )
+    for scene in (geometry, batched):
+        blocked = trace(scene, origins, directions, 10)
+        full = trace(scene._replace(flat_blocks=None), origins, directions, 10)
+        assert blocked.bounces.any()
+        np.testing.assert_array_equal(blocked.bounces, full.bounces)
+        np.testing.assert_allclose(blocked.points, full.points)
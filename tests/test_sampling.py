@@ -0,0 +1,67 @@
+import numpy as np
+
+from pyoptics.config import parse_cfg_lines
+from pyoptics.optics2d import OpticSystem, SphericalMirror
+from pyoptics.optics2d.kernels import trace, unit_vectors
+from pyoptics.sampling import adaptive_fan
+
+
+def shoot(system, angles, steps=5):
+    origins = np.zeros(angles.shape + (2,))
+    result = trace(system.compile().geometry, origins, unit_vectors(angles), steps)
+    return result.endpoints(), result.bounces
+
+
+def misinterpolated(angles, endpoints, bounces, reference, tolerance=0.05):
+    ref_angles, ref_endpoints, ref_bounces = reference
+    right = np.clip(np.searchsorted(angles, ref_angles), 1, len(angles) - 1)
+    left = right - 1
+    t = (ref_angles - angles[left]) / (angles[right] - angles[left])
+    guess = endpoints[left] + t[:, None] * (endpoints[right] - endpoints[left])
+    wrong = np.linalg.norm(guess - ref_endpoints, axis=-1) > tolerance
+    wrong |= (bounces[left] != ref_bounces) | (bounces[right] != ref_bounces)
+    return wrong.sum()
+
+
+def test_adaptive_fan_beats_uniform_fan_of_same_size():
+    system = OpticSystem([SphericalMirror((2, 0), 0, 1.5, 0.5)])
+    start, stop = -1.0, 1.0
+    fan = adaptive_fan(system, (0, 0), start, stop, steps=5, max_rays=200)
+
+    assert np.all(np.diff(fan.angles) > 0)
+    assert fan.angles[0] == start and fan.angles[-1] == stop
+    endpoints, bounces = shoot(system, fan.angles)
+    np.testing.assert_allclose(fan.endpoints, endpoints)
+    np.testing.assert_array_equal(fan.bounces, bounces)
+
+    ref_angles = np.linspace(start, stop, 100_000)
+    reference = (ref_angles, *shoot(system, ref_angles))
+    uniform = np.linspace(start, stop, len(fan.angles))
+    adaptive_wrong = misinterpolated(fan.angles, fan.endpoints, fan.bounces, reference)
+    uniform_wrong = misinterpolated(uniform, *shoot(system, uniform), reference)
+    assert adaptive_wrong * 10 < uniform_wrong
+
+
+def test_missed_rays_are_refined_only_to_angle_tolerance():
+    system = OpticSystem([SphericalMirror((2, 0), 0, 1.5, 0.5)])
+    fan = adaptive_fan(system, (0, 0), 2, 4, steps=5, initial=8, angle_tolerance=0.05)
+    assert not fan.bounces.any()
+    # the directions of missed rays differ only by their angles
+    assert 0.05 / 2 < np.diff(fan.angles).min() <= np.diff(fan.angles).max() <= 0.05
+
+
+def test_config_fan_is_sampled_against_the_file():
+    mirror = "S, 2, 0, 0, 1.5, 0.5\n"
+    fan = "A, 0, 0, 0, 60, 80\n"
+    optics, rays = parse_cfg_lines([mirror, fan])
+    assert 16 < len(rays) <= 80
+    assert all(np.array_equal(ray.location, (0, 0)) for ray in rays)
+
+    # moving the mirror afterwards does not resample the fan
+    angles = [ray.rotation for ray in rays]
+    optics[0].location = (2, 5)
+    assert [ray.rotation for ray in rays] == angles
+
+    # parsing the edited file does
+    _, moved = parse_cfg_lines([mirror.replace("2, 0", "2, 5"), fan])
+    assert len(moved) != len(rays)
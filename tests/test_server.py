@@ -0,0 +1,142 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import numpy as np
+import pytest
+
+from pyoptics import server as server_module
+from pyoptics.optics2d import FlatMirror, OpticSystem, RayEmitter
+from pyoptics.optics2d.kernels import trace
+from pyoptics.server import ServerError, TraceClient, TraceServer
+
+
+CONFIG = "F, 2, 0, 0, 4\nE, 0, 0, 0\nE, 0, 1, 0\n"
+
+
+async def round_trip(server: TraceServer, socket: str):
+    listener = await server.serve_unix(socket)
+    client = await TraceClient.connect(path=socket)
+    try:
+        loaded = await client.load("a", config=CONFIG)
+        assert (loaded["optics"], loaded["rays"]) == (1, 2)
+        first = await client.trace("a", steps=5)
+        np.testing.assert_allclose(first.endpoints(), [[2, 0], [2, 1]], atol=1e-9)
+        assert list(first.bounces) == [1, 1]
+
+        # several requests in flight on one connection
+        again, custom = await asyncio.gather(
+            client.trace("a", steps=5),
+            client.trace("a", steps=5, origins=[[0, -1]], directions=[[1, 0]]),
+        )
+        np.testing.assert_array_equal(again.points, first.points)
+        np.testing.assert_allclose(custom.endpoints(), [[2, -1]], atol=1e-9)
+
+        await client.update("a", 0, "location", (3, 0))
+        moved = await client.trace("a", steps=5)
+        np.testing.assert_allclose(moved.endpoints(), [[3, 0], [3, 1]], atol=1e-9)
+        # rotations are given like in the config, where 0 faces the emitters
+        await client.update("a", 0, "rotation", 0.0)
+        turned = await client.trace("a", steps=5)
+        np.testing.assert_allclose(turned.endpoints(), [[3, 0], [3, 1]], atol=1e-9)
+        assert list(turned.bounces) == [1, 1]
+
+        with pytest.raises(ServerError, match="ConfigError"):
+            await client.load("b", config="F, 1\n")
+        with pytest.raises(ServerError, match="cannot be updated"):
+            await client.update("a", 0, "version", 1)
+
+        await client.load("b", config=CONFIG.replace("F, 2", "F, 4"))
+        assert await client.scenes() == ["a", "b"]
+        other = await client.trace("b", steps=5)
+        np.testing.assert_allclose(other.endpoints(), [[4, 0], [4, 1]], atol=1e-9)
+
+        await client.drop("a")
+        assert await client.scenes() == ["b"]
+        with pytest.raises(ServerError, match="KeyError"):
+            await client.trace("a")
+    finally:
+        await client.close()
+        listener.close()
+        await listener.wait_closed()
+
+
+def test_round_trip_with_workers(tmp_path):
+    server = TraceServer(workers=2)
+    try:
+        asyncio.run(round_trip(server, str(tmp_path / "server.sock")))
+    finally:
+        server.close()
+
+
+def test_round_trip_with_executor(tmp_path):
+    with ThreadPoolExecutor(2) as executor:
+        server = TraceServer(executor)
+        assert not server.workers
+        asyncio.run(round_trip(server, str(tmp_path / "server.sock")))
+
+
+def test_geometry_is_sent_once_per_scene_version(monkeypatch):
+    sent = []
+    trace_scene = server_module._trace_scene
+
+    def spy(scene, token, geometry, *args):
+        sent.append(geometry is not None)
+        return trace_scene(scene, token, geometry, *args)
+
+    async def run(server):
+        monkeypatch.setattr(server_module, "_trace_scene", spy)
+        await server.handle({"op": "load", "scene": "a", "config": CONFIG}, [])
+        trace_request = {"op": "trace", "scene": "a", "steps": 5}
+        await server.handle(trace_request, [])
+        await server.handle(trace_request, [])
+        await server.handle(
+            {"op": "update", "scene": "a", "index": 0, "attribute": "rotation", "value": 0.1},
+            [],
+        )
+        await server.handle(trace_request, [])
+        await server.handle(trace_request, [])
+        await server.handle({"op": "drop", "scene": "a"}, [])
+
+    # a thread pool stands in for the worker processes, keeping the spy visible
+    server = TraceServer(workers=1)
+    server.close()
+    server.workers = [ThreadPoolExecutor(1)]
+    server._next_worker = iter(server.workers)
+    asyncio.run(run(server))
+    server.workers[0].shutdown()
+    assert sent == [True, False, True, False]
+    assert "a" not in server_module._WORKER_SCENES
+
+
+def test_worker_cache():
+    system = OpticSystem([FlatMirror((2, 0), 0, 4)], [RayEmitter((0, 0), 0)])
+    geometry = system.compile().geometry
+    origins, directions = np.zeros((1, 2)), np.array([[1.0, 0.0]])
+    try:
+        assert server_module._trace_scene("s", 1, None, origins, directions, 3) is None
+        result = server_module._trace_scene("s", 1, geometry, origins, directions, 3)
+        np.testing.assert_array_equal(
+            result.points, trace(geometry, origins, directions, 3).points
+        )
+        cached = server_module._trace_scene("s", 1, None, origins, directions, 3)
+        np.testing.assert_array_equal(cached.points, result.points)
+        # a newer scene version has to be sent along
+        assert server_module._trace_scene("s", 2, None, origins, directions, 3) is None
+    finally:
+        server_module._forget_scene("s")
+
+
+def test_load_parses_off_the_event_loop(monkeypatch):
+    threads = []
+    parse = server_module._parse
+
+    def spy(request):
+        threads.append(threading.current_thread())
+        return parse(request)
+
+    monkeypatch.setattr(server_module, "_parse", spy)
+    with ThreadPoolExecutor(1) as executor:
+        server = TraceServer(executor)
+        asyncio.run(server.handle({"op": "load", "scene": "a", "config": CONFIG}, []))
+    assert threads and threads[0] is not threading.main_thread()
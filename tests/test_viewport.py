@@ -0,0 +1,161 @@
+import argparse
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+import pytest
+
+from pyoptics.__main__ import SETTLE_DELAY, UIRunner
+from pyoptics.optics2d import FlatMirror, OpticSystem, RayEmitter
+from pyoptics.renderer import RenderScene
+
+
+def make_scene(rays=1, lod_rays=2000):
+    system = OpticSystem(
+        [FlatMirror((2, 0), 0, 4)],
+        [RayEmitter((0, y), 0) for y in np.linspace(-1, 1, rays)],
+    )
+    return RenderScene(system, pygame.Surface((200, 100)), 5, 10, (100, 50), lod_rays)
+
+
+def test_zoom_keeps_anchor_in_place():
+    scene = make_scene()
+    anchor = (30, 70)
+    before = scene.from_scene_coords(anchor)
+    scene.zoom(1.7, anchor)
+    np.testing.assert_allclose(scene.from_scene_coords(anchor), before)
+    assert scene.scale == pytest.approx(17)
+
+
+def test_pan_moves_view():
+    scene = make_scene()
+    before = scene.view_bounds()
+    scene.pan((10, -20))
+    np.testing.assert_allclose(scene.view_bounds(), before + (-1, -2, -1, -2))
+    np.testing.assert_allclose(before, (-10, -5, 10, 5))
+
+
+def test_culling():
+    scene = make_scene()
+    view = scene.view_bounds()
+    flat = scene.object_renderers[0]
+    assert flat.is_visible(view)
+    flat.obj.location = (50, 0)
+    assert not flat.is_visible(view)
+
+
+def test_density_raster_for_many_rays():
+    scene = make_scene(rays=50, lod_rays=10)
+    scene.reset()
+    scene.run()
+    # the rays run between the emitters and the mirror, at x from 0 to 2
+    pixels = pygame.surfarray.array3d(scene.scr)
+    assert pixels[105:115, 45:55, 0].any()
+    assert not pixels[150:, :, :].any()
+
+
+class FakeMouse:
+    pos = (0, 0)
+
+    def get_pos(self):
+        return self.pos
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    mouse = FakeMouse()
+    monkeypatch.setattr(pygame, "mouse", mouse)
+    args = argparse.Namespace(
+        config=None, resolution=(200, 200), steps=5, scale=50, watch=False
+    )
+    runner = UIRunner(args)
+    runner.scene.add(RayEmitter((0, 0), 0))
+    runner.scene.add(FlatMirror((2, 0), 0, 2))
+    runner.scene.middle = (100, 100)
+    runner.mouse = mouse
+    yield runner
+    pygame.quit()
+
+
+def event(kind, **attributes):
+    return pygame.event.Event(kind, **attributes)
+
+
+def test_drag_ends_only_with_its_button(runner):
+    runner.mouse.pos = (100, 100)  # over the emitter
+    runner.process_event(event(pygame.MOUSEBUTTONDOWN, button=pygame.BUTTON_LEFT))
+    assert runner.dragging
+
+    # the wheel's compatibility buttons and a second button do not end the drag
+    for button in (4, 5, pygame.BUTTON_RIGHT):
+        runner.process_event(event(pygame.MOUSEBUTTONDOWN, button=button))
+        runner.process_event(event(pygame.MOUSEBUTTONUP, button=button))
+        assert runner.dragging
+
+    runner.mouse.pos = (150, 100)
+    runner.process_event(event(pygame.MOUSEMOTION, rel=(50, 0)))
+    np.testing.assert_allclose(runner.scene.system.rays[0].location, (1, 0))
+
+    runner.process_event(event(pygame.MOUSEBUTTONUP, button=pygame.BUTTON_LEFT))
+    assert not runner.dragging
+    assert runner.moved is None
+
+
+def test_pan_with_right_button(runner):
+    runner.mouse.pos = (10, 10)
+    runner.process_event(event(pygame.MOUSEBUTTONDOWN, button=pygame.BUTTON_RIGHT))
+    assert runner.panning
+    runner.process_event(event(pygame.MOUSEBUTTONUP, button=pygame.BUTTON_LEFT))
+    assert runner.panning
+    runner.process_event(event(pygame.MOUSEMOTION, rel=(5, 5)))
+    assert runner.scene.middle == (105, 105)
+    runner.process_event(event(pygame.MOUSEBUTTONUP, button=pygame.BUTTON_RIGHT))
+    assert not runner.panning
+
+
+def test_wheel_buttons_do_not_trace(runner, monkeypatch):
+    traces = []
+    monkeypatch.setattr(runner, "full_trace", lambda: traces.append(1))
+    for button in (4, 5, 6, 7):
+        runner.process_event(event(pygame.MOUSEBUTTONDOWN, button=button))
+        runner.process_event(event(pygame.MOUSEBUTTONUP, button=button))
+    assert not traces
+    assert not runner.panning
+
+
+def test_preview_keeps_paths_of_skipped_rays(runner):
+    for y in (0.2, 0.4, 0.6):
+        runner.scene.add(RayEmitter((0, y), 0))
+    runner.full_trace()
+    paths = [list(ray.bounce_locations) for ray in runner.scene.system.rays]
+    assert all(paths)
+
+    runner.preview_stride = 2
+    runner.preview()
+    for ray, path in zip(runner.scene.system.rays[1::2], paths[1::2]):
+        assert len(ray.bounce_locations) == len(path)
+        for point, expected in zip(ray.bounce_locations, path):
+            np.testing.assert_array_equal(point, expected)
+
+    # later frames start from the full paths again, not from the previous preview
+    runner.preview_stride = 2
+    runner.preview()
+    assert len(runner.scene.system.rays[1].bounce_locations) == len(paths[1])
+
+
+def test_wheel_rotation_traces_once_settled(runner, monkeypatch):
+    traces = []
+    monkeypatch.setattr(runner, "full_trace", lambda: traces.append(1))
+    runner.mouse.pos = (200, 100)  # over the mirror
+    runner.process_event(event(pygame.MOUSEWHEEL, x=0, y=1))
+    runner.process_event(event(pygame.MOUSEBUTTONDOWN, button=4))
+    runner.process_event(event(pygame.MOUSEBUTTONUP, button=4))
+    assert runner.previewing
+    assert not runner.settle()
+    assert not traces
+
+    runner.last_interaction -= 2 * SETTLE_DELAY
+    assert runner.settle()
+    assert traces == [1]
@@ -0,0 +1,83 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+from pyoptics.optics2d import OpticSystem
+from pyoptics.renderer import RenderScene
+from pyoptics.utils import parse_cfg, scene_from_cfg, update_scene_from_cfg
+
+
+# two separate beams, each bouncing between its own pair of mirrors
+CONFIG = """\
+F, 3, 0, 0, 4
+F, -3, 0, 0, 4
+E, 0, 0, 10
+F, 3, 10, 0, 4
+F, -3, 10, 0, 4
+E, 0, 10, 10
+"""
+
+
+def load(tmp_path, text=CONFIG):
+    path = tmp_path / "scene.pyop"
+    path.write_text(text)
+    scene = scene_from_cfg(str(path), pygame.Surface((60, 60)), steps=10)
+    scene.reset()
+    scene.run()
+    return path, scene
+
+
+def reload(path, scene, text):
+    path.write_text(text)
+    return update_scene_from_cfg(str(path), scene)
+
+
+def assert_matches_fresh_trace(path, scene, rays):
+    for ray in rays:
+        ray.reset()
+    scene.run(rays=rays)
+    fresh = RenderScene(
+        OpticSystem(*parse_cfg(str(path))), pygame.Surface((60, 60)), scene.steps
+    )
+    fresh.reset()
+    fresh.run()
+    for live, expected in zip(scene.system.rays, fresh.system.rays):
+        np.testing.assert_allclose(live.current_ray_location, expected.current_ray_location)
+        np.testing.assert_allclose(live.bounce_locations, expected.bounce_locations)
+
+
+def test_unchanged_file_retraces_nothing(tmp_path):
+    path, scene = load(tmp_path)
+    assert reload(path, scene, CONFIG) == []
+
+
+def test_only_rays_near_changed_optic_are_retraced(tmp_path):
+    path, scene = load(tmp_path)
+    optics = list(scene.system.optics)
+
+    rays = reload(path, scene, CONFIG.replace("F, 3, 10, 0, 4", "F, 4, 10, 0, 4"))
+    assert rays == [scene.system.rays[1]]
+    # the edited mirror is updated in place
+    assert scene.system.optics == optics
+    np.testing.assert_array_equal(optics[2].location, (4, 10))
+    assert_matches_fresh_trace(path, scene, rays)
+
+
+def test_added_and_removed_lines(tmp_path):
+    path, scene = load(tmp_path)
+
+    text = CONFIG.replace("F, -3, 0, 0, 4\n", "") + "E, 1, 10, 190\n"
+    rays = reload(path, scene, text)
+    assert len(scene.system.optics) == 3
+    assert len(scene.object_renderers) == 3 + 3
+    assert rays == [scene.system.rays[0], scene.system.rays[2]]
+    assert_matches_fresh_trace(path, scene, rays)
+
+
+def test_unrelated_optic_retraces_nothing(tmp_path):
+    path, scene = load(tmp_path)
+    assert reload(path, scene, CONFIG + "F, 0, 30, 90, 1\n") == []
+    assert len(scene.system.optics) == 5